@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+監視スクリプト（watch_drive.py）の追記ログ data/data.jsonl を data/data.json にまとめる。
+
+watch_drive.py は追加した商品をまず data.jsonl に1行ずつ追記し（1件あたり数百バイトの書き込みで済み、
+途中で落ちても消えない）、数秒ごとに data.json へまとめて書き出してから data.jsonl を空にする。
+書き出す前に止まった場合は、次に監視を起動したときか、このスクリプトを実行したときに data.json へ取り込まれる。
+サイト（index.html など）は従来どおり data.json だけを読む。
+
+使い方:
+  python scripts/compact_jsonl.py                 # data/data.json と data/data.jsonl
+  python scripts/compact_jsonl.py path/to/data.json
+"""
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def journal_path(data_json_path: Path) -> Path:
+    """data.json に対応する追記ログ（同じフォルダの data.jsonl）"""
+    return data_json_path.with_suffix(".jsonl")
+
+
+def read_jsonl(path: Path) -> list[dict]:
+    """追記ログを読む。書きかけで落ちた最後の行など、読めない行は飛ばす。"""
+    items: list[dict] = []
+    if not path.exists():
+        return items
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(item, dict):
+                items.append(item)
+    return items
+
+
+def compact(data_json_path: Path) -> int:
+    """
+    data.jsonl の商品を data.json の末尾に足して書き出し、data.jsonl を消す。足した件数を返す。
+    data.json に同じ id が既にある行（書き出し直後に落ちた分）は足さない。
+    data.json が壊れているときは例外を投げ、どちらのファイルも変更しない。
+    """
+    jsonl_path = journal_path(data_json_path)
+    pending = read_jsonl(jsonl_path)
+    if not pending:
+        jsonl_path.unlink(missing_ok=True)
+        return 0
+    items: list = []
+    if data_json_path.exists():
+        with open(data_json_path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        if not isinstance(items, list):
+            items = []
+    known = {item.get("id") for item in items if isinstance(item, dict)}
+    added = [item for item in pending if item.get("id") not in known]
+    if added:
+        data_json_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(data_json_path, "w", encoding="utf-8") as f:
+            json.dump(items + added, f, ensure_ascii=False, indent=2)
+    jsonl_path.unlink()
+    return len(added)
+
+
+def main() -> int:
+    data_json_path = Path(sys.argv[1]) if len(sys.argv) > 1 else PROJECT_ROOT / "data" / "data.json"
+    try:
+        n = compact(data_json_path)
+    except Exception as e:
+        print(f"data.json にまとめられませんでした: {e}")
+        return 1
+    print(f"{journal_path(data_json_path).name} から {n} 件を {data_json_path.name} に追加しました。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
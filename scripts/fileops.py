@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+process_screenshots.py と watch_drive.py で共通のファイル操作。
+"""
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+
+
+def fast_copy(src: Path, dest: Path) -> None:
+    """
+    src の中身を dest にコピーする（メタデータはコピーしない）。
+    ハードリンクにはしない: src（screenshots_input/ や processed/ の画像）が同じ名前で上書きされると、
+    公開済みの images/ 側まで一緒に変わってしまうため。
+    Linux では copy_file_range で kernel 内コピー（btrfs / XFS などでは reflink になりデータを複製しない）、
+    使えなければ shutil.copyfile。dest に既存のファイルがあれば先に外す。
+    """
+    dest.unlink(missing_ok=True)
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:  # 別ファイルシステム間で非対応の古いカーネルなど
+            pass
+    shutil.copyfile(src, dest)
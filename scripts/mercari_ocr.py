@@ -3,15 +3,32 @@
 Region-based OCR for Mercari iPhone screenshots (e.g. 1179x2556).
 Extracts brand and product_name from fixed crop regions using Tesseract (psm 6, jpn+eng).
 Crop ratios and preprocessing are configurable.
+Uses the in-process tesserocr API when installed (one persistent session, no subprocess per region);
+otherwise falls back to pytesseract.
+OMP_THREAD_LIMIT defaults to 1 (regions and images are parallelized instead); set e.g.
+OMP_THREAD_LIMIT=4 in the environment for single-image interactive runs.
 """
 from __future__ import annotations
 
+import os
+
+# Tesseract の OpenMP スレッドは 1 に（領域・画像単位で並列化するため）。
+# tesserocr / pytesseract より前に設定すること。環境変数で指定済みならそちらを優先。
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import functools
+import logging
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 from PIL import Image
 
+logger = logging.getLogger(__name__)
+
 # iPhone resolution for fixed crop (no auto-detect)
 IPHONE_WIDTH = 1179
 IPHONE_HEIGHT = 2556
@@ -19,6 +36,8 @@ IPHONE_HEIGHT = 2556
 ZONE1_TITLE = {"x": 0, "y": 1570, "width": 1179, "height": 120}
 # Zone 2: Brand/status line — directly below Zone 1, height=80
 ZONE2_BRAND_STATUS = {"x": 0, "y": 1570 + 120, "width": 1179, "height": 80}
+# Zone 1 + Zone 2 as one adjacent stripe (cropped once, then split into the two zones)
+ZONE12_TITLE_BRAND = {"x": 0, "y": 1570, "width": 1179, "height": 120 + 80}
 # Legacy single crop (used by extract_product_title_fixed standalone)
 PRODUCT_TITLE_CROP = {"x": 0, "y": 1570, "width": 1179, "height": 120}
 
@@ -27,20 +46,46 @@ DEFAULT_BRAND_REGION = {"x_min": 0.05, "x_max": 0.95, "y_min": 0.60, "y_max": 0.
 DEFAULT_PRODUCT_REGION = {"x_min": 0.05, "x_max": 0.95, "y_min": 0.40, "y_max": 0.48}
 DEFAULT_PRICE_REGION = {"x_min": 0.05, "x_max": 0.95, "y_min": 0.52, "y_max": 0.60}
 
+# Screenshot formats we decode (skips Pillow's probe over every registered plugin)
+IMAGE_FORMATS = ("PNG", "JPEG", "WEBP")
+
 # Dot variants to normalize to "・" (middle dot)
 DOT_VARIANTS = ["･", "·", ".", "•", "｡"]
 
 # UI words to remove from product name text
 PRODUCT_UI_WORDS = ["いいね", "コメント", "商品の説明", "配送料", "税込", "送料込み"]
 
+# Precompiled once: all UI words in one alternation, prices (¥1,234 / 1,234円), whitespace runs.
+# Longest words first so overlapping words are removed leftmost-longest (as a multi-pattern
+# Aho–Corasick pass would), not by list order.
+_UI_WORDS_RE = re.compile("|".join(re.escape(w) for w in sorted(PRODUCT_UI_WORDS, key=len, reverse=True)))
+_PRICE_RE = re.compile(r"¥\s*[\d,]+|\d{1,3}(?:,\d{3})*\s*円")
+_WS_RE = re.compile(r"\s+")
+_DOT_TABLE = str.maketrans({d: "・" for d in DOT_VARIANTS})
 
-def _load_region_config(config_path: Path | None) -> tuple[dict, dict, dict]:
-    """Load brand_region, product_region, price_region from config. Returns (brand, product, price)."""
+
+def _load_region_config(config_path: Path | None) -> tuple[dict, dict, dict, bool]:
+    """
+    Load brand_region, product_region, price_region and the preprocess flag from config.
+    Returns (brand, product, price, preprocess). Parsed once per file version (path + mtime).
+    """
+    if not config_path or not config_path.exists():
+        return dict(DEFAULT_BRAND_REGION), dict(DEFAULT_PRODUCT_REGION), dict(DEFAULT_PRICE_REGION), False
+    try:
+        mtime_ns = config_path.stat().st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    brand, product, price, preprocess = _read_region_config(str(config_path), mtime_ns)
+    return dict(brand), dict(product), dict(price), preprocess
+
+
+@functools.lru_cache(maxsize=8)
+def _read_region_config(config_path: str, mtime_ns: int) -> tuple[dict, dict, dict, bool]:
+    """Parse the config file. mtime_ns is only part of the cache key (edits invalidate the entry)."""
     brand = dict(DEFAULT_BRAND_REGION)
     product = dict(DEFAULT_PRODUCT_REGION)
     price = dict(DEFAULT_PRICE_REGION)
-    if not config_path or not config_path.exists():
-        return brand, product, price
+    preprocess = False
     try:
         import json
         with open(config_path, "r", encoding="utf-8") as f:
@@ -51,29 +96,63 @@ def _load_region_config(config_path: Path | None) -> tuple[dict, dict, dict]:
                 for k in ("x_min", "x_max", "y_min", "y_max"):
                     if k in z:
                         default[k] = float(z[k])
+        preprocess = data.get("preprocess") is True
     except Exception:
         pass
-    return brand, product, price
+    return brand, product, price, preprocess
 
 
-def _crop_region(pil_img: Image.Image, region: dict) -> Image.Image:
-    """Crop image by ratio (0–1). region: x_min, x_max, y_min, y_max."""
-    w, h = pil_img.size
-    x0 = int(w * region["x_min"])
-    x1 = int(w * region["x_max"])
-    y0 = int(h * region["y_min"])
-    y1 = int(h * region["y_max"])
-    return pil_img.crop((x0, y0, x1, y1))
+def _open_image(image_path: Path) -> Image.Image:
+    """Open a screenshot as RGB (Pillow-SIMD, if installed instead of Pillow, speeds this up)."""
+    img = Image.open(image_path, formats=IMAGE_FORMATS)
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    # Already RGB (typical JPEG): convert() would only copy the pixels, so just decode in place
+    img.load()
+    return img
 
 
-def _crop_fixed_zone(pil_img: Image.Image, zone: dict) -> Image.Image:
-    """Crop by fixed pixel zone: x, y, width, height. Clamps to image bounds."""
-    w, h = pil_img.size
+def _region_box(w: int, h: int, region: dict) -> tuple[int, int, int, int]:
+    """(left, top, right, bottom) for a ratio region (0–1): x_min, x_max, y_min, y_max."""
+    return int(w * region["x_min"]), int(h * region["y_min"]), int(w * region["x_max"]), int(h * region["y_max"])
+
+
+def _zone_box(w: int, h: int, zone: dict) -> tuple[int, int, int, int]:
+    """(left, top, right, bottom) for a fixed pixel zone (x, y, width, height), clamped to image bounds."""
     left = max(0, min(zone["x"], w - 1))
     top = max(0, min(zone["y"], h - 1))
     right = min(left + zone["width"], w)
     bottom = min(top + zone["height"], h)
-    return pil_img.crop((left, top, right, bottom))
+    return left, top, right, bottom
+
+
+def _crop_region(pil_img: Image.Image, region: dict) -> Image.Image:
+    """Crop image by ratio (0–1). region: x_min, x_max, y_min, y_max."""
+    return pil_img.crop(_region_box(*pil_img.size, region))
+
+
+def _crop_fixed_zone(pil_img: Image.Image, zone: dict) -> Image.Image:
+    """Crop by fixed pixel zone: x, y, width, height. Clamps to image bounds."""
+    return pil_img.crop(_zone_box(*pil_img.size, zone))
+
+
+def _crop_region_np(arr: np.ndarray, region: dict) -> np.ndarray:
+    """_crop_region for an (H,W[,C]) ndarray. Returns a zero-copy view."""
+    left, top, right, bottom = _region_box(arr.shape[1], arr.shape[0], region)
+    return arr[top:bottom, left:right]
+
+
+def _crop_fixed_zone_np(arr: np.ndarray, zone: dict) -> np.ndarray:
+    """_crop_fixed_zone for an (H,W[,C]) ndarray. Returns a zero-copy view."""
+    left, top, right, bottom = _zone_box(arr.shape[1], arr.shape[0], zone)
+    return arr[top:bottom, left:right]
+
+
+def _crop_zones12_np(arr: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Zone 1 (title) and Zone 2 (brand/status) as views of one combined 200px stripe."""
+    stripe = _crop_fixed_zone_np(arr, ZONE12_TITLE_BRAND)
+    split = ZONE1_TITLE["height"]
+    return stripe[:split], stripe[split:]
 
 
 def _crop_zone1_title(pil_img: Image.Image) -> Image.Image:
@@ -93,16 +172,13 @@ def _crop_product_title_fixed(pil_img: Image.Image) -> Image.Image:
 
 def _normalize_dots(text: str) -> str:
     """Replace dot variants with '・'."""
-    s = text
-    for d in DOT_VARIANTS:
-        s = s.replace(d, "・")
-    return s
+    return text.translate(_DOT_TABLE)
 
 
 def _extract_brand_from_raw(raw: str) -> str:
     """Split by '・'; if len(parts) >= 3, return parts[1].strip()."""
     raw = _normalize_dots(raw)
-    parts = raw.split("・")
+    parts = raw.split("・", 2)  # only the first two separators matter
     if len(parts) >= 3:
         return parts[1].strip()[:40]
     return raw.strip()[:40]
@@ -110,18 +186,15 @@ def _extract_brand_from_raw(raw: str) -> str:
 
 def _clean_product_text(raw: str) -> str:
     """Remove UI words, price pattern (¥ and numbers), extra line breaks; join to one string."""
-    s = raw.strip()
-    for w in PRODUCT_UI_WORDS:
-        s = re.sub(re.escape(w), "", s)
-    s = re.sub(r"¥\s*[\d,]+", "", s)
-    s = re.sub(r"\d{1,3}(,\d{3})*\s*円", "", s)
-    s = re.sub(r"\n\s*", " ", s)
-    s = re.sub(r"\s+", " ", s)
+    s = _UI_WORDS_RE.sub("", raw.strip())
+    s = _PRICE_RE.sub("", s)
+    s = _WS_RE.sub(" ", s)
     return s.strip()[:150]
 
 
+@functools.lru_cache(maxsize=1)
 def _find_tesseract_cmd() -> str | None:
-    """PATH に無い場合、Windows のよくあるインストール先から tesseract.exe を探す。"""
+    """PATH に無い場合、Windows のよくあるインストール先から tesseract.exe を探す（結果はキャッシュ）。"""
     import shutil
     if shutil.which("tesseract"):
         return None  # PATH で見つかったらそのまま
@@ -135,78 +208,346 @@ def _find_tesseract_cmd() -> str | None:
     return None
 
 
-def _run_tesseract(pil_img: Image.Image, lang: str = "jpn+eng", psm: int = 6) -> str:
-    """Run Tesseract OCR. Returns extracted text."""
+@functools.lru_cache(maxsize=1)
+def _get_tesserocr() -> Any:
+    """Import tesserocr on first OCR call (loads libtesseract). None → pytesseract fallback."""
+    try:
+        import tesserocr
+    except ImportError:  # pytesseract (tesseract subprocess per call) にフォールバック
+        return None
+    return tesserocr
+
+
+@functools.lru_cache(maxsize=1)
+def _get_pytesseract() -> Any:
+    """Import pytesseract on first use and point it at the tesseract binary once. None if missing."""
     try:
         import pytesseract
     except ImportError:
-        return ""
+        return None
+    # tesseract のパス解決はプロセスごとに 1 回だけ
     cmd = _find_tesseract_cmd()
     if cmd:
         pytesseract.pytesseract.tesseract_cmd = cmd
+    return pytesseract
+
+
+# Persistent tesserocr sessions, one per thread (PyTessBaseAPI is not thread-safe when shared).
+_TESS_LOCAL = threading.local()
+_TESS_API_FAILED = False  # True once init failed (e.g. tessdata not found); stop retrying
+
+
+def _get_tess_api(lang: str) -> Any:
+    """Return this thread's PyTessBaseAPI for lang, creating it on first use."""
+    api = getattr(_TESS_LOCAL, "api", None)
+    if api is not None and _TESS_LOCAL.lang == lang:
+        return api
+    if api is not None:
+        api.End()
+        _TESS_LOCAL.api = None
+    tesserocr = _get_tesserocr()
+    kwargs: dict[str, Any] = {"lang": lang, "psm": tesserocr.PSM.SINGLE_BLOCK}
+    cmd = _find_tesseract_cmd()
+    if cmd:
+        # PATH に無い Windows インストールでは tessdata も同じフォルダにある
+        kwargs["path"] = str(Path(cmd).parent / "tessdata")
+    api = tesserocr.PyTessBaseAPI(**kwargs)
+    _TESS_LOCAL.api = api
+    _TESS_LOCAL.lang = lang
+    _TESS_LOCAL.psm = int(tesserocr.PSM.SINGLE_BLOCK)
+    return api
+
+
+def _run_tesserocr(img: Image.Image | np.ndarray, lang: str, psm: int) -> str:
+    """OCR via this thread's persistent tesserocr session. Raises if the API cannot be initialized."""
+    api = _get_tess_api(lang)
+    if psm != _TESS_LOCAL.psm:
+        api.SetPageSegMode(psm)
+        _TESS_LOCAL.psm = psm
+    if isinstance(img, np.ndarray):
+        # Raw pixels straight from the (view) crop; no PIL Image in between
+        h, w = img.shape[:2]
+        bpp = 1 if img.ndim == 2 else img.shape[2]
+        api.SetImageBytes(img.tobytes(), w, h, bpp, w * bpp)
+    else:
+        api.SetImage(img)
+    return (api.GetUTF8Text() or "").strip()
+
+
+# Long-lived pool so each worker thread keeps its tesserocr session across images.
+_REGION_POOL: ThreadPoolExecutor | None = None
+_REGION_POOL_LOCK = threading.Lock()
+_REGION_WORKERS = 3  # Zone 1, Zone 2, price
+# Set in extract_from_images pool workers: the processes already use every core, so each OCRs its
+# three regions one after another instead of adding three threads per worker.
+_SERIAL_REGIONS = False
+
+
+def _get_region_pool() -> ThreadPoolExecutor:
+    """Return the shared region OCR thread pool, creating it on first use."""
+    global _REGION_POOL
+    with _REGION_POOL_LOCK:
+        if _REGION_POOL is None:
+            _REGION_POOL = ThreadPoolExecutor(max_workers=_REGION_WORKERS, thread_name_prefix="ocr-region")
+        return _REGION_POOL
+
+
+def _reset_after_fork() -> None:
+    """
+    Forked children (ProcessPoolExecutor workers on Linux) inherit the region pool and tesserocr
+    sessions but not their threads; the stale pool would count its dead threads as idle and never
+    start new ones. Start the child with a fresh pool, lock and per-thread sessions instead.
+    """
+    global _REGION_POOL, _REGION_POOL_LOCK, _TESS_LOCAL
+    _REGION_POOL = None
+    _REGION_POOL_LOCK = threading.Lock()
+    _TESS_LOCAL = threading.local()
+
+
+if hasattr(os, "register_at_fork"):  # POSIX only; Windows spawns fresh interpreters
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _ocr_region(crop: Image.Image | np.ndarray, preprocess: bool = False, contrast_factor: float = 1.5) -> str:
+    """Optionally preprocess one crop (ocr_preprocess pipeline), then OCR it."""
+    if preprocess:
+        try:
+            from scripts import ocr_preprocess
+        except ImportError:
+            import ocr_preprocess
+        crop = ocr_preprocess.preprocess_for_ocr(crop, contrast_factor=contrast_factor)
+    return _run_tesseract(crop)
+
+
+def _run_tesseract(pil_img: Image.Image | np.ndarray, lang: str = "jpn+eng", psm: int = 6) -> str:
+    """Run Tesseract OCR on a PIL Image or uint8 ndarray crop. Returns extracted text."""
+    global _TESS_API_FAILED
+    if isinstance(pil_img, np.ndarray) and pil_img.size == 0:
+        return ""  # zone outside a smaller-than-expected screenshot
+    if not _TESS_API_FAILED and _get_tesserocr() is not None:
+        try:
+            return _run_tesserocr(pil_img, lang, psm)
+        except RuntimeError:
+            _TESS_API_FAILED = True  # tessdata が見つからない等 → 以降は pytesseract
+        except Exception:
+            return ""
+    pytesseract = _get_pytesseract()
+    if pytesseract is None:
+        return ""
     try:
         return (pytesseract.image_to_string(pil_img, lang=lang, config=f"--psm {psm}") or "").strip()
     except Exception:
         return ""
 
 
+# EasyOCR backend (optional): one Reader per process, fed same-size zone crops in batches
+EASYOCR_BATCH_SIZE = 16
+_EASYOCR_READER: Any = None
+_EASYOCR_LOCK = threading.Lock()
+
+
+def create_easyocr_reader(model_dir: str | Path | None = None) -> Any:
+    """
+    Build and warm an easyocr.Reader (ja+en, GPU when available) for the easyocr backend.
+    Long-running callers (e.g. the folder watcher) create one up front and pass it as reader=.
+    model_dir pins where the model weights live (default: EasyOCR's own, ~/.EasyOCR/model or
+    $EASYOCR_MODULE_PATH/model). Once weights are there, the reader is built with downloads
+    disabled so startup does no network I/O; if a weight is missing it falls back to downloading.
+    """
+    import easyocr
+    kwargs: dict[str, Any] = {"gpu": True, "cudnn_benchmark": True}
+    reader = None
+    if model_dir:
+        model_dir = Path(model_dir)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        kwargs["model_storage_directory"] = str(model_dir)
+        if any(model_dir.glob("*.pth")):
+            try:
+                reader = easyocr.Reader(["ja", "en"], download_enabled=False, **kwargs)
+            except FileNotFoundError:
+                reader = None  # e.g. the recognizer for a newly added language is not there yet
+    if reader is None:
+        reader = easyocr.Reader(["ja", "en"], **kwargs)
+    # Warm-up: the first batched call pays cuDNN autotuning and allocations
+    blank = np.zeros((ZONE1_TITLE["height"], ZONE1_TITLE["width"], 3), dtype=np.uint8)
+    reader.readtext_batched([blank, blank], detail=0)
+    return reader
+
+
+def _get_easyocr_reader() -> Any:
+    """Return the shared per-process easyocr.Reader, creating it on first use."""
+    global _EASYOCR_READER
+    with _EASYOCR_LOCK:
+        if _EASYOCR_READER is None:
+            _EASYOCR_READER = create_easyocr_reader()
+        return _EASYOCR_READER
+
+
+def _zone_or_blank(crop: np.ndarray, zone: dict) -> np.ndarray:
+    """Empty crops (screenshot smaller than the zone) become a blank zone-sized image."""
+    if crop.size:
+        return crop
+    return np.zeros((zone["height"], zone["width"], 3), dtype=np.uint8)
+
+
+def _run_easyocr_batch(
+    reader: Any, crops_zone1: list[np.ndarray], crops_zone2: list[np.ndarray]
+) -> tuple[list[str], list[str]]:
+    """
+    OCR stacked Zone 1 / Zone 2 crops with one readtext_batched call per zone.
+    All crops of a zone share the zone size, so the detector runs on one batch.
+    Returns (zone1 texts, zone2 texts), one joined string per crop.
+    """
+
+    def run(crops: list[np.ndarray], zone: dict) -> list[str]:
+        if not crops:
+            return []
+        batch = [_zone_or_blank(c, zone) for c in crops]
+        results = reader.readtext_batched(batch, n_width=zone["width"], n_height=zone["height"], detail=0)
+        return [" ".join(t.strip() for t in texts if t.strip()) for texts in results]
+
+    return run(crops_zone1, ZONE1_TITLE), run(crops_zone2, ZONE2_BRAND_STATUS)
+
+
+def _empty_result() -> dict[str, str]:
+    return {"brand": "", "product_name": "", "raw_brand_text": "", "raw_product_text": "", "raw_price_text": ""}
+
+
+def _load_screenshot(image_path: Path) -> np.ndarray | None:
+    """Decode a screenshot to an RGB ndarray (one buffer shared by all zone views). None on failure."""
+    if not image_path.exists():
+        return None
+    try:
+        pil = _open_image(image_path)
+    except Exception as e:
+        print(f"ERROR: Could not load image: {image_path}")
+        print(f"  {e}")
+        return None
+    if pil is None or pil.size[0] == 0 or pil.size[1] == 0:
+        print(f"ERROR: Could not load image: {image_path} (invalid or empty)")
+        return None
+    return np.asarray(pil)
+
+
+def _build_result(name: str, raw_product_text: str, raw_brand_text: str, raw_price_text: str) -> dict[str, str]:
+    """Turn raw zone OCR text into the extract_from_image result dict."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[Raw OCR] %s Zone 1 (title): %r", name, raw_product_text)
+        logger.debug("[Raw OCR] %s Zone 2 (brand/status): %r", name, raw_brand_text)
+        logger.debug("[Raw OCR] %s price region: %r", name, raw_price_text)
+    return {
+        "brand": _extract_brand_from_raw(raw_brand_text),
+        "product_name": _clean_product_text(raw_product_text),
+        "raw_brand_text": raw_brand_text,
+        "raw_product_text": raw_product_text,
+        "raw_price_text": raw_price_text,
+    }
+
+
+def _extract_easyocr(paths: list[Path], price_region: dict, reader: Any = None) -> list[dict[str, str]]:
+    """
+    EasyOCR backend: Zone 1 / Zone 2 crops of up to EASYOCR_BATCH_SIZE screenshots per batched call.
+    Uses the given reader, else the shared per-process one.
+    """
+    results: list[dict[str, str]] = []
+    if reader is None:
+        reader = _get_easyocr_reader()
+    for start in range(0, len(paths), EASYOCR_BATCH_SIZE):
+        chunk = paths[start : start + EASYOCR_BATCH_SIZE]
+        arrays = [_load_screenshot(p) for p in chunk]
+        loaded = [a for a in arrays if a is not None]
+        zones = [_crop_zones12_np(a) for a in loaded]
+        zone1_texts, zone2_texts = _run_easyocr_batch(reader, [z1 for z1, _ in zones], [z2 for _, z2 in zones])
+        zone_texts = iter(zip(zone1_texts, zone2_texts))
+        for p, a in zip(chunk, arrays):
+            if a is None:
+                results.append(_empty_result())
+                continue
+            raw_product_text, raw_brand_text = next(zone_texts)
+            price_crop = _crop_region_np(a, price_region)
+            raw_price_text = " ".join(reader.readtext(price_crop, detail=0)) if price_crop.size else ""
+            results.append(_build_result(p.name, raw_product_text, raw_brand_text, raw_price_text))
+    return results
+
+
 def extract_from_image(
     image_path: Path | str,
     config_path: Path | None = None,
     *,
     preprocess: bool = False,
     contrast_factor: float = 1.5,
+    backend: str = "tesseract",
+    reader: Any = None,
 ) -> dict[str, str]:
     """
     Extract brand and product_name from a single Mercari screenshot.
     Two fixed crop zones (1179x2556): Zone 1 = product title (120px), Zone 2 = brand/status (80px, below Zone 1).
     OCR runs separately per zone. Brand is extracted ONLY from Zone 2 (never from product title).
-    Preprocessing disabled. Uses lang="jpn+eng", --psm 6.
+    Preprocessing only when preprocess=True or config "preprocess": true. Uses lang="jpn+eng", --psm 6.
+    backend="easyocr" uses EasyOCR instead of Tesseract (GPU when available; preprocessing not applied),
+    with reader (from create_easyocr_reader) if given, else a per-process shared Reader.
 
     Returns:
         { "brand", "product_name", "raw_brand_text", "raw_product_text", "raw_price_text" }
     """
     image_path = Path(image_path)
-    if not image_path.exists():
-        return {"brand": "", "product_name": "", "raw_brand_text": "", "raw_product_text": "", "raw_price_text": ""}
+    _, _, price_region, config_preprocess = _load_region_config(config_path)
+    if backend == "easyocr":
+        return _extract_easyocr([image_path], price_region, reader)[0]
+    preprocess = preprocess or config_preprocess
+    # Default: OCR on cropped original only. Brand from Zone 2 only, not from title.
 
-    _, _, price_region = _load_region_config(config_path)
-    # Preprocessing disabled: OCR on cropped original only. Brand from Zone 2 only, not from title.
-
-    try:
-        pil = Image.open(image_path).convert("RGB")
-    except Exception as e:
-        print(f"ERROR: Could not load image: {image_path}")
-        print(f"  {e}")
-        return {"brand": "", "product_name": "", "raw_brand_text": "", "raw_product_text": "", "raw_price_text": ""}
-    if pil is None or pil.size[0] == 0 or pil.size[1] == 0:
-        print(f"ERROR: Could not load image: {image_path} (invalid or empty)")
-        return {"brand": "", "product_name": "", "raw_brand_text": "", "raw_product_text": "", "raw_price_text": ""}
+    arr = _load_screenshot(image_path)
+    if arr is None:
+        return _empty_result()
 
     # Zone 1: Product title only (height 120px). OCR → product_name. Do NOT use for brand.
-    zone1_crop = _crop_zone1_title(pil)
-    raw_product_text = _run_tesseract(zone1_crop)
-    print(f"[Raw OCR] {image_path.name} Zone 1 (title): {repr(raw_product_text)}")
-    product_name = _clean_product_text(raw_product_text)
-
     # Zone 2: Brand/status line only (height 80px, below Zone 1). Brand MUST be extracted from here only.
-    zone2_crop = _crop_zone2_brand_status(pil)
-    raw_brand_text = _run_tesseract(zone2_crop)
-    print(f"[Raw OCR] {image_path.name} Zone 2 (brand/status): {repr(raw_brand_text)}")
-    brand = _extract_brand_from_raw(raw_brand_text)
-
     # Price region — ratio-based (unchanged)
-    price_crop = _crop_region(pil, price_region)
-    raw_price_text = _run_tesseract(price_crop)
-    print(f"[Raw OCR] {image_path.name} price region: {repr(raw_price_text)}")
+    # The three crops are independent; tesseract releases the GIL, so OCR them concurrently.
+    zone1, zone2 = _crop_zones12_np(arr)
+    crops = [zone1, zone2, _crop_region_np(arr, price_region)]
+    ocr = functools.partial(_ocr_region, preprocess=preprocess, contrast_factor=contrast_factor)
+    regions = map(ocr, crops) if _SERIAL_REGIONS else _get_region_pool().map(ocr, crops)
+    raw_product_text, raw_brand_text, raw_price_text = regions
+    return _build_result(image_path.name, raw_product_text, raw_brand_text, raw_price_text)
 
-    return {
-        "brand": brand,
-        "product_name": product_name,
-        "raw_brand_text": raw_brand_text,
-        "raw_product_text": raw_product_text,
-        "raw_price_text": raw_price_text,
-    }
+
+def _worker_init() -> None:
+    """ProcessPoolExecutor initializer: one OpenMP thread, regions OCR'd serially (one tesseract per core)."""
+    global _SERIAL_REGIONS
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    _SERIAL_REGIONS = True
+
+
+def extract_from_images(
+    image_paths: list[Path | str],
+    config_path: Path | None = None,
+    *,
+    workers: int | None = None,
+    backend: str = "tesseract",
+    reader: Any = None,
+) -> list[dict[str, str]]:
+    """
+    Run extract_from_image over many screenshots in a process pool (default: one worker per CPU).
+    Each worker keeps its own tesserocr session and OCRs an image's regions serially, so models load
+    once per worker, not per image, and the pool runs at most one tesseract per CPU.
+    backend="easyocr" runs in-process instead, batching zone crops across screenshots
+    (with reader if given, else the per-process shared Reader).
+    Returns results in the same order as image_paths.
+    """
+    paths = [Path(p) for p in image_paths]
+    if not paths:
+        return []
+    if backend == "easyocr":
+        _, _, price_region, _ = _load_region_config(config_path)
+        return _extract_easyocr(paths, price_region, reader)
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    extract = functools.partial(extract_from_image, config_path=config_path)
+    if workers <= 1:
+        return [extract(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as ex:
+        return list(ex.map(extract, paths))
 
 
 def extract_product_title_fixed(
@@ -222,7 +563,7 @@ def extract_product_title_fixed(
     if not image_path.exists():
         return {"raw_crop_path": "", "raw_ocr_result": ""}
     try:
-        pil = Image.open(image_path).convert("RGB")
+        pil = _open_image(image_path)
     except Exception as e:
         print(f"ERROR: Could not load image: {image_path}\n  {e}")
         return {"raw_crop_path": "", "raw_ocr_result": ""}
@@ -238,13 +579,23 @@ def extract_product_title_fixed(
     return {"raw_crop_path": str(crop_path), "raw_ocr_result": raw_text}
 
 
-# Allow running as script for one image (fixed crop: 1179x2556 product title zone only)
+# Allow running as script: one image (fixed crop: 1179x2556 product title zone only),
+# or a glob / several images (full extraction in a process pool, results printed as JSON)
 if __name__ == "__main__":
+    import glob
+    import json
     import sys
     project_root = Path(__file__).resolve().parent.parent
-    path = Path(sys.argv[1]) if len(sys.argv) > 1 else None
-    if not path or not path.exists():
+    args = sys.argv[1:]
+    if len(args) == 1 and Path(args[0]).is_file():
+        crop_dir = project_root / "crop_product_title"
+        extract_product_title_fixed(Path(args[0]), save_crop_dir=crop_dir)
+        sys.exit(0)
+    paths = sorted({Path(p) for a in args for p in glob.glob(a) if Path(p).is_file()})
+    if not paths:
         print("Usage: python mercari_ocr.py <image_path>")
+        print("       python mercari_ocr.py \"screenshots_input/*.png\"  (batch)")
         sys.exit(1)
-    crop_dir = project_root / "crop_product_title"
-    extract_product_title_fixed(path, save_crop_dir=crop_dir)
+    results = extract_from_images(paths, project_root / "screenshot_config.json")
+    out = [{"file": p.name, **r} for p, r in zip(paths, results)]
+    print(json.dumps(out, ensure_ascii=False, indent=2))
@@ -2,58 +2,147 @@
 """
 Modular image preprocessing for OCR (Mercari iPhone screenshots).
 Each step can be used independently; pipeline runs: grayscale → resize 2x → contrast → adaptive threshold → sharpen.
+Steps run on OpenCV when available (one uint8 ndarray through the whole pipeline, no PIL round-trips);
+without cv2 they fall back to NumPy/PIL and adaptive threshold is skipped.
 """
 from __future__ import annotations
 
+import functools
+import threading
+
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
+
+# ITU-R 601 luma weights in 8-bit fixed point (sum = 256)
+_LUMA_COEFFS = np.array([77, 150, 29], dtype=np.uint16)
+# 3x3 sharpen kernel (center 5, 4-neighbours -1)
+_SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+
+
+# Reusable (H, W) uint8 buffers for the intermediate pipeline steps, keyed by shape
+_BUF_POOL: dict[tuple[int, ...], list[np.ndarray]] = {}
+_BUF_POOL_LOCK = threading.Lock()
+_BUF_POOL_MAX_PER_SHAPE = 8
+
+
+def _acquire(shape: tuple[int, ...]) -> np.ndarray:
+    """Take a uint8 buffer of this shape from the pool (or allocate one). Contents are undefined."""
+    with _BUF_POOL_LOCK:
+        bufs = _BUF_POOL.get(shape)
+        if bufs:
+            return bufs.pop()
+    return np.empty(shape, dtype=np.uint8)
+
+
+def _release(buf: np.ndarray) -> None:
+    """Return a buffer obtained from _acquire to the pool."""
+    with _BUF_POOL_LOCK:
+        bufs = _BUF_POOL.setdefault(buf.shape, [])
+        if len(bufs) < _BUF_POOL_MAX_PER_SHAPE:
+            bufs.append(buf)
+
+
+def _into(result: np.ndarray, out: np.ndarray | None) -> np.ndarray:
+    """Copy result into out when given (fallback paths that cannot write in place)."""
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+
+@functools.lru_cache(maxsize=1)
+def _get_cv2():
+    """Import OpenCV on first use (its shared libraries are large). None if not installed."""
+    try:
+        import cv2
+    except ImportError:
+        return None
+    return cv2
+
+
+def _cv2_interpolation(resample: Image.Resampling) -> int:
+    """Map a PIL resampling filter to the matching cv2 interpolation flag."""
+    cv2 = _get_cv2()
+    return {
+        Image.Resampling.NEAREST: cv2.INTER_NEAREST,
+        Image.Resampling.BILINEAR: cv2.INTER_LINEAR,
+        Image.Resampling.BICUBIC: cv2.INTER_CUBIC,
+        Image.Resampling.LANCZOS: cv2.INTER_LANCZOS4,
+        Image.Resampling.BOX: cv2.INTER_AREA,
+    }.get(resample, cv2.INTER_LINEAR)
 
 
 def to_grayscale(img: np.ndarray | Image.Image) -> np.ndarray:
     """Convert to grayscale. Accepts RGB numpy (H,W,3) or PIL Image."""
+    cv2 = _get_cv2()
     if isinstance(img, Image.Image):
-        img = np.array(img)
+        return np.asarray(img.convert("L"))
     if img.ndim == 3:
-        # RGB -> luminance
-        return np.round(0.299 * img[:, :, 0] + 0.587 * img[:, :, 1] + 0.114 * img[:, :, 2]).astype(np.uint8)
+        if cv2 is not None:
+            code = cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(img, code)
+        # RGB -> luminance in fixed point (0.299, 0.587, 0.114 scaled by 256), one uint16 pass
+        return ((img[:, :, :3].astype(np.uint16) @ _LUMA_COEFFS + 128) >> 8).astype(np.uint8)
     return img
 
 
-def resize_2x(img: np.ndarray) -> np.ndarray:
-    """Upscale by 2x (better for small text)."""
-    from PIL import Image as PILImage
-    pil = PILImage.fromarray(img)
-    w, h = pil.size
-    pil = pil.resize((w * 2, h * 2), PILImage.Resampling.LANCZOS)
-    return np.array(pil)
+def resize_2x(
+    img: np.ndarray,
+    resample: Image.Resampling = Image.Resampling.BILINEAR,
+    max_side: int | None = 1000,
+) -> np.ndarray:
+    """
+    Upscale by 2x (better for small text). BILINEAR by default; pass LANCZOS for higher quality.
+    Returns img unchanged when its longer side is already >= max_side (None: always upscale),
+    since Tesseract rescales text lines itself.
+    """
+    cv2 = _get_cv2()
+    h, w = img.shape[:2]
+    if max_side is not None and max(w, h) >= max_side:
+        return img
+    if cv2 is not None:
+        return cv2.resize(img, (w * 2, h * 2), interpolation=_cv2_interpolation(resample))
+    pil = Image.fromarray(img)
+    pil = pil.resize((w * 2, h * 2), resample)
+    return np.asarray(pil)
 
 
-def increase_contrast(img: np.ndarray, factor: float = 1.5) -> np.ndarray:
-    """Increase contrast. factor > 1 strengthens contrast."""
-    pil = Image.fromarray(img)
-    enhancer = ImageEnhance.Contrast(pil)
-    pil = enhancer.enhance(factor)
-    return np.array(pil)
+def increase_contrast(img: np.ndarray, factor: float = 1.5, out: np.ndarray | None = None) -> np.ndarray:
+    """Increase contrast. factor > 1 strengthens contrast. Writes into out when given."""
+    cv2 = _get_cv2()
+    # Same as ImageEnhance.Contrast: (x - mean) * factor + mean, saturated to 0..255
+    mean = int(float(img.mean()) + 0.5)
+    if cv2 is not None:
+        return cv2.addWeighted(img, factor, img, 0, (1.0 - factor) * mean, dst=out)
+    res = img.astype(np.float32)
+    res *= factor
+    res += (1.0 - factor) * mean
+    return _into(np.clip(np.rint(res), 0, 255).astype(np.uint8), out)
 
 
-def adaptive_threshold(img: np.ndarray, block_size: int = 15, c: int = 8) -> np.ndarray:
-    """Adaptive threshold for uneven lighting. Prefer odd block_size."""
-    try:
-        import cv2
-    except ImportError:
+def adaptive_threshold(
+    img: np.ndarray, block_size: int = 15, c: int = 8, out: np.ndarray | None = None
+) -> np.ndarray:
+    """Adaptive threshold for uneven lighting. Prefer odd block_size. Writes into out when given."""
+    cv2 = _get_cv2()
+    if cv2 is None:
         return img
     if block_size % 2 == 0:
         block_size += 1
     return cv2.adaptiveThreshold(
-        img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, c
+        img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, c, dst=out
     )
 
 
-def sharpen(img: np.ndarray) -> np.ndarray:
-    """Sharpen image (helps thin text)."""
-    pil = Image.fromarray(img)
-    pil = pil.filter(ImageFilter.SHARPEN)
-    return np.array(pil)
+def sharpen(img: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """Sharpen image (helps thin text). Writes into out when given."""
+    cv2 = _get_cv2()
+    if cv2 is not None:
+        return cv2.filter2D(img, -1, _SHARPEN_KERNEL, dst=out)
+    # Same 5-point stencil in NumPy (reflect border like cv2's default)
+    p = np.pad(img, 1, mode="reflect").astype(np.int16)
+    res = 5 * p[1:-1, 1:-1] - p[:-2, 1:-1] - p[2:, 1:-1] - p[1:-1, :-2] - p[1:-1, 2:]
+    return _into(np.clip(res, 0, 255).astype(np.uint8), out)
 
 
 def preprocess_for_ocr(
@@ -61,26 +150,59 @@ def preprocess_for_ocr(
     *,
     grayscale: bool = True,
     resize_2x_flag: bool = True,
+    resample: Image.Resampling = Image.Resampling.BILINEAR,
     contrast_factor: float = 1.5,
     adaptive_thresh: bool = True,
     sharpen_flag: bool = True,
+    resize_min_side: int | None = 80,
+    thresh_max_std: float | None = 55.0,
+    sharpen_max_height: int | None = 120,
 ) -> Image.Image:
     """
     Full pipeline for OCR: grayscale → resize 2x → contrast → adaptive threshold → sharpen.
+    Accepts PIL Image or ndarray; every step works on the same uint8 ndarray.
+    Stages are skipped when the crop does not need them (None disables a gate):
+      - resize 2x: skipped if min(h, w) >= resize_min_side (text already large enough)
+      - adaptive threshold: skipped if grayscale std > thresh_max_std (already good dynamic range)
+      - sharpen: skipped if crop height <= sharpen_max_height (Tesseract rescales short lines itself),
+        and always after adaptive threshold (a binary image has nothing to sharpen)
     Returns PIL Image for pytesseract.
     """
-    if isinstance(img, Image.Image):
-        img = np.array(img.convert("RGB") if img.mode != "L" else img)
-    if img.ndim == 3:
+    cv2 = _get_cv2()
+    if isinstance(img, Image.Image) or img.ndim == 3:
         img = to_grayscale(img)
-    elif grayscale:
-        pass  # already gray
+    h, w = img.shape[:2]
+    if resize_min_side is not None and min(h, w) >= resize_min_side:
+        resize_2x_flag = False
+    if adaptive_thresh and thresh_max_std is not None and float(img.std()) > thresh_max_std:
+        adaptive_thresh = False
+    if sharpen_max_height is not None and h <= sharpen_max_height:
+        sharpen_flag = False
+    if adaptive_thresh and cv2 is not None:
+        sharpen_flag = False
     if resize_2x_flag:
-        img = resize_2x(img)
+        img = resize_2x(img, resample=resample)
+    steps = []
     if contrast_factor and contrast_factor != 1.0:
-        img = increase_contrast(img, factor=contrast_factor)
+        steps.append(functools.partial(increase_contrast, factor=contrast_factor))
     if adaptive_thresh:
-        img = adaptive_threshold(img)
+        steps.append(adaptive_threshold)
     if sharpen_flag:
-        img = sharpen(img)
+        steps.append(sharpen)
+    # Intermediate results ping-pong between two pooled buffers; the last step gets a fresh
+    # array because the returned PIL Image may share its memory.
+    bufs = [_acquire(img.shape) for _ in range(min(2, len(steps) - 1))]
+    try:
+        for i, step in enumerate(steps):
+            out = None
+            if i < len(steps) - 1:
+                out = bufs[0] if img is not bufs[0] else bufs[1]
+            img = step(img, out=out)
+        # A step that returns its input unchanged (adaptive_threshold without cv2) can leave a pooled
+        # buffer as the result; copy it so the returned image does not share memory with the pool.
+        if any(img is buf for buf in bufs):
+            img = img.copy()
+    finally:
+        for buf in bufs:
+            _release(buf)
     return Image.fromarray(img)
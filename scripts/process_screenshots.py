@@ -15,15 +15,41 @@ os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")
   5. メルカリタイトルをそのまま商品名として抜き出し、商品ごとに1件として出力（ブランドの下に商品がぶら下がる形）
   6. 結果は suggested_products.json に出力。画像は images/ にコピーされる
 
-必要: pip install easyocr
+必要: Tesseract 本体 + pip install -r requirements-screenshots.txt（既定）
+      EasyOCR を使う場合は pip install easyocr（screenshot_config.json で ocr_engine: "easyocr"）
 """
 
 from pathlib import Path
+import functools
+import hashlib
+import importlib.util
 import json
 import re
-import shutil
+from collections import defaultdict
 from datetime import date
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # 標準の json で書く
+    orjson = None
+
+try:
+    import imagehash
+except ImportError:  # 知覚ハッシュによるキャッシュ共有なし（バイト列のハッシュだけ）
+    imagehash = None
+
+try:
+    from scripts import fileops
+except ImportError:
+    import fileops
+
+try:
+    import ijson
+except ImportError:  # data.json を丸ごと json.load して id を探す
+    ijson = None
+
 # プロジェクトのルート（このスクリプトの2つ上のフォルダ）
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 INPUT_DIR = PROJECT_ROOT / "screenshots_input"
@@ -31,6 +57,7 @@ IMAGES_DIR = PROJECT_ROOT / "images"
 DATA_JSON = PROJECT_ROOT / "data" / "data.json"
 OUTPUT_JSON = PROJECT_ROOT / "suggested_products.json"
 CONFIG_JSON = PROJECT_ROOT / "screenshot_config.json"
+IMAGE_EXTENSIONS = frozenset((".png", ".jpg", ".jpeg", ".webp"))
 
 # 座標固定用ゾーン（screenshot_config.json があれば上書き。割合は 0〜1）
 def _load_zone_config() -> dict:
@@ -55,22 +82,53 @@ def _load_zone_config() -> dict:
 
 
 def _config_use_mercari_iphone_ocr() -> bool:
-    """screenshot_config.json で use_mercari_iphone_ocr または ocr_engine: tesseract なら True"""
+    """
+    Tesseract の領域OCR（mercari_ocr）を使うなら True（既定）。
+    screenshot_config.json で use_mercari_iphone_ocr: false または ocr_engine: easyocr のときだけ EasyOCR。
+    """
     if not CONFIG_JSON.exists():
-        return False
+        return True
     try:
         with open(CONFIG_JSON, "r", encoding="utf-8") as f:
             data = json.load(f)
-        if data.get("use_mercari_iphone_ocr") is True:
-            return True
-        if data.get("ocr_engine") == "tesseract":
-            return True
+        if data.get("use_mercari_iphone_ocr") is False:
+            return False
+        if data.get("ocr_engine") == "easyocr":
+            return False
+        return True
+    except Exception:
+        return True
+
+
+def _config_crop_before_ocr() -> bool:
+    """screenshot_config.json で crop_before_ocr: true なら True（EasyOCR をゾーン部分だけにかける）"""
+    if not CONFIG_JSON.exists():
         return False
+    try:
+        with open(CONFIG_JSON, "r", encoding="utf-8") as f:
+            return json.load(f).get("crop_before_ocr") is True
+    except Exception:
+        return False
+
+
+def _config_reuse_similar_ocr() -> bool:
+    """
+    screenshot_config.json で reuse_similar_ocr: true なら True（見た目がほぼ同じ画像の OCR 結果を使い回す）。
+    同じテンプレートの別商品（タイトル・価格だけ違う）も pHash が近くなるので既定は無効。
+    """
+    if not CONFIG_JSON.exists():
+        return False
+    try:
+        with open(CONFIG_JSON, "r", encoding="utf-8") as f:
+            return json.load(f).get("reuse_similar_ocr") is True
     except Exception:
         return False
 
 
 ZONE_CONFIG = _load_zone_config()
+CROP_BEFORE_OCR = _config_crop_before_ocr() and bool(ZONE_CONFIG)
+# 知覚ハッシュで見つけた「ほぼ同じ画像」の結果を使うか（imagehash も必要）。無効なら中身が同じ画像だけ使い回す
+REUSE_SIMILAR_OCR = _config_reuse_similar_ocr() and imagehash is not None
 
 # 「ブランド」の右隣・直下に来る「値」として扱わないラベル（メルカリの項目名のみ除外し、それ以外はすべてブランド名として採用）
 BRAND_VALUE_EXCLUDE = (
@@ -84,11 +142,30 @@ BRAND_INVALID_CONTAINS = (
 )
 
 
+# よく使う正規表現はモジュール読み込み時に1回だけコンパイルする
+_RE_WS = re.compile(r"\s+")
+_RE_MULTI_WS = re.compile(r"\s{2,}")
+_RE_ALNUM = re.compile(r"[A-Za-z0-9]")
+_RE_QUOTE_NOISE = re.compile(r"[』」']")
+_RE_GOOD_CHARS = re.compile(r"[^A-Za-z0-9\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff\u0020\u00b7\u301c\u2014]")
+_RE_BRAND_AFTER = re.compile(r"ブランド\s*[：:]?\s*")
+_RE_CATEGORY = re.compile(r"\s*カテゴリ(?:ー)?\s*")
+_RE_LEADING_SEP = re.compile(r"^[：:\s]+")
+_RE_BRAND_PART_END = re.compile(r"\s{2,}|\d+円")
+_RE_ALPHA_BRAND = re.compile(r"^([A-Za-z][A-Za-z0-9\s\-]+?)(?:\s|$|/|カテゴリ)")
+# 「ブランド」直後のアルファベット塊。空白は半角/全角だけ（改行・タブは _WS_TAB で空白化済み）、長さも上限付きで
+# 終端の無いテキストでもバックトラックが広がらないようにする
+_RE_BRAND_FULL = re.compile(
+    r"ブランド[ 　:：]{0,3}([A-Za-z][A-Za-z0-9 　・\-]{1,38}?)(?=[ 　]{2,}|[ 　]+カテゴリ|[ 　]*/[ 　]*ファッション|$)"
+)
+_RE_ID_NUM = re.compile(r"(\d+)$")  # 末尾の数字（search で使う）
+# 改行・タブを空白にそろえる（1回の translate で済ませる）
+_WS_TAB = str.maketrans({"\n": " ", "\r": " ", "\t": " "})
+
+
 def normalize_text(s: str) -> str:
     """比較用に空白を除き1文字以上にする"""
-    if not s or not s.strip():
-        return ""
-    return re.sub(r"\s+", "", s.strip())
+    return "".join(s.split()) if s else ""
 
 
 def _is_valid_brand(s: str) -> bool:
@@ -118,13 +195,11 @@ def _brand_between_dots(s: str) -> str:
 
 def get_text_in_top_portion(detections: list, img_height: int, top_ratio: float = 0.35) -> str:
     """画像の上側（top_ratio まで）にあるテキストだけを結合して返す。メルカリタイトル・スクロール時の商品名認識用。"""
-    top_y_max = img_height * top_ratio
-    parts = []
-    for (bbox, text, _) in detections:
-        # bbox: [[x1,y1],[x2,y2],[x3,y3],[x4,y4]] の4点。上端は min(y1,y2,y3,y4)
-        ys = [p[1] for p in bbox]
-        if min(ys) < top_y_max and text.strip():
-            parts.append(text.strip())
+    if not detections:
+        return ""
+    _, _, top, _ = _bbox_stats(detections)
+    in_top = top < img_height * top_ratio
+    parts = [text.strip() for (_, text, _), keep in zip(detections, in_top) if keep and text.strip()]
     return " ".join(parts) if parts else ""
 
 
@@ -133,10 +208,21 @@ def get_full_text(detections: list) -> str:
     return " ".join(t.strip() for (_, t, _) in detections if t.strip())
 
 
-def _bbox_height(bbox: list) -> float:
-    """bbox の高さを返す（フォントサイズの目安）"""
-    ys = [p[1] for p in bbox]
-    return max(ys) - min(ys)
+def _bbox_stats(detections: list) -> tuple:
+    """
+    全検出の bbox を (N, 4, 2) の配列にまとめ、(中心x, 中心y, 上端y, 高さ) をそれぞれ長さ N の配列で返す。
+    bbox: [[x1,y1],[x2,y2],[x3,y3],[x4,y4]] の4点。高さはフォントサイズの目安。
+    """
+    boxes = np.asarray([d[0] for d in detections], dtype=np.float32).reshape(-1, 4, 2)
+    xs = boxes[:, :, 0]
+    ys = boxes[:, :, 1]
+    top = ys.min(axis=1)
+    return xs.mean(axis=1), ys.mean(axis=1), top, ys.max(axis=1) - top
+
+
+def _zone_mask(cx, cy, x_min: float, x_max: float, y_min: float, y_max: float):
+    """中心がゾーン内にある検出の bool マスク"""
+    return (cx >= x_min) & (cx <= x_max) & (cy >= y_min) & (cy <= y_max)
 
 
 # 商品名として明らかに不正（説明文・UIが混ざった結果＝ここで切る）
@@ -156,17 +242,17 @@ def _looks_like_product_name(s: str) -> bool:
     # 商品名によくある要素が含まれるか：【】・アルファベット/数字が3文字以上・サイズ/色
     if "【" in s or "】" in s:
         return True
-    alnum = re.findall(r"[A-Za-z0-9]", s)
+    alnum = _RE_ALNUM.findall(s)
     if len(alnum) >= 3:
         return True
     if "サイズ" in s or "濃紺" in s or "ブラック" in s or "ホワイト" in s or "ネイビー" in s:
         return True
     # 誤検出の括弧・記号だらけで【】やアルファベットがほとんどない場合はノイズ
-    if re.search(r"[』」']", s) and "】" not in s and "【" not in s and len(alnum) < 3:
+    if _RE_QUOTE_NOISE.search(s) and "】" not in s and "【" not in s and len(alnum) < 3:
         return False
     if len(s) <= 4:
         return False
-    good = re.sub(r"[^A-Za-z0-9\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff\u0020\u00b7\u301c\u2014]", "", s)
+    good = _RE_GOOD_CHARS.sub("", s)
     if len(good) < len(s) * 0.4:
         return False
     return True
@@ -200,21 +286,20 @@ def get_product_name_zone_text(detections: list, img_height: int, img_width: int
         y_max = img_height * 0.55
         x_min = 0
         x_max = img_width if img_width > 0 else 99999
+    if not detections:
+        return ""
+    cx, cy, _, heights = _bbox_stats(detections)
+    mask = _zone_mask(cx, cy, x_min, x_max, y_min, y_max)
     in_zone = []
-    for (bbox, text, _) in detections:
-        t = (text or "").strip()
+    for i in np.flatnonzero(mask):
+        t = (detections[i][1] or "").strip()
         if not t or len(t) < 2:
             continue
         if any(ex in t for ex in PRODUCT_NAME_ZONE_EXCLUDE):
             continue
         if any(pat in t for pat in PRODUCT_NAME_LINE_EXCLUDE_PATTERNS):
             continue
-        cx, cy = _bbox_center(bbox)
-        if not (x_min <= cx <= x_max):
-            continue
-        if y_min <= cy <= y_max:
-            h = _bbox_height(bbox)
-            in_zone.append((cy, h, t))
+        in_zone.append((float(cy[i]), float(heights[i]), t))
     if not in_zone:
         return ""
     # フォントが大きい順→上から。商品名は大きいので上位を採用（状態説明は上記で除外済み）
@@ -241,13 +326,6 @@ def get_product_name_zone_text(detections: list, img_height: int, img_width: int
     return raw[:150]
 
 
-def _bbox_center(bbox: list) -> tuple:
-    """bbox の中心 (x, y) を返す。bbox は [[x1,y1],[x2,y2],[x3,y3],[x4,y4]]"""
-    xs = [p[0] for p in bbox]
-    ys = [p[1] for p in bbox]
-    return (sum(xs) / 4, sum(ys) / 4)
-
-
 def extract_brand_from_detections(detections: list, img_height: int, img_width: int) -> str:
     """
     メルカリの「ブランド」項目を、OCR の位置情報またはテキスト順で抽出する。
@@ -262,11 +340,8 @@ def extract_brand_from_detections(detections: list, img_height: int, img_width:
         y_max = img_height * zone["y_max"]
         x_min = img_width * zone["x_min"]
         x_max = img_width * zone["x_max"]
-        filtered = []
-        for (bbox, text, conf) in detections:
-            cx, cy = _bbox_center(bbox)
-            if x_min <= cx <= x_max and y_min <= cy <= y_max:
-                filtered.append((bbox, text, conf))
+        cx, cy, _, _ = _bbox_stats(detections)
+        filtered = [detections[i] for i in np.flatnonzero(_zone_mask(cx, cy, x_min, x_max, y_min, y_max))]
         detections = filtered if filtered else detections
     full_text = get_full_text(detections)
     # 座標固定時: ゾーン内が「L・JACOB COHEN・目立った傷や汚れなし」のような1行なら、・と・の間を採用
@@ -276,49 +351,46 @@ def extract_brand_from_detections(detections: list, img_height: int, img_width:
             return cand
     # まず「ブランド」を含む検出を探す
     brand_idx = None
-    brand_cx = None
-    brand_cy = None
-    for i, (bbox, text, _) in enumerate(detections):
-        t = (text or "").strip()
-        if not t:
-            continue
-        if "ブランド" in t:
+    for i, (_, text, _) in enumerate(detections):
+        if "ブランド" in (text or ""):
             brand_idx = i
-            brand_cx, brand_cy = _bbox_center(bbox)
             break
     if brand_idx is not None:
         # 同じブロックに「ブランド」の直後テキストがあればそれを優先（例: "項目 ブランド JACOB COHEN"）
         _, brand_block_text, _ = detections[brand_idx]
         if brand_block_text:
-            after = re.split(r"ブランド\s*[：:]?\s*", brand_block_text, 1)
+            after = _RE_BRAND_AFTER.split(brand_block_text, 1)
             if len(after) > 1:
                 rest = after[-1].strip()
                 for stop in ("商品の状態", "配送料の負担", "配送の方法", "カテゴリ"):
                     if stop in rest:
                         rest = rest[: rest.find(stop)].strip()
-                rest = re.split(r"\s*カテゴリ(?:ー)?\s*", rest)[0].strip()
-                rest = re.split(r"\s{2,}", rest)[0].strip()
+                rest = _RE_CATEGORY.split(rest)[0].strip()
+                rest = _RE_MULTI_WS.split(rest)[0].strip()
                 cand = _brand_between_dots(rest)
                 if cand and _is_valid_brand(cand):
                     return cand
 
         # 「ブランド」の右隣または直下のテキストをブランド名とする（アルファベット・カタカナ・漢字・数字いずれでも可）
-        y_tolerance = img_height * 0.18
+        cx, cy, _, _ = _bbox_stats(detections)
+        brand_cx, brand_cy = cx[brand_idx], cy[brand_idx]
+        dx = cx - brand_cx
+        dy = cy - brand_cy
+        same_line = (np.abs(dy) <= img_height * 0.18) & (dx > 0)
+        below = ~same_line & (dy > 0) & (np.abs(dx) <= img_width * 0.5)
+        same_line[brand_idx] = below[brand_idx] = False
         candidates_same_line = []
         candidates_below = []
-        for i, (bbox, text, _) in enumerate(detections):
-            if i == brand_idx:
-                continue
-            t = (text or "").strip()
+        for i in np.flatnonzero(same_line | below):
+            t = (detections[i][1] or "").strip()
             if not t or len(t) > 50:
                 continue
             if t in BRAND_VALUE_EXCLUDE or t.startswith("カテゴリ"):
                 continue
-            cx, cy = _bbox_center(bbox)
-            if abs(cy - brand_cy) <= y_tolerance and cx > brand_cx:
-                candidates_same_line.append((cx - brand_cx, t))
-            elif cy > brand_cy and abs(cx - brand_cx) <= img_width * 0.5:
-                candidates_below.append((cy - brand_cy, t))
+            if same_line[i]:
+                candidates_same_line.append((float(dx[i]), t))
+            else:
+                candidates_below.append((float(dy[i]), t))
         # 同一行は x 順に並べ、「カテゴリー」等の手前まで結合して1つのブランド名にする（"JACOB" "COHEN" → "JACOB COHEN"）
         if candidates_same_line:
             candidates_same_line.sort(key=lambda x: x[0])
@@ -350,14 +422,14 @@ def extract_brand_from_text(full_text: str) -> str:
     「ブランド」の直後～次の項目（カテゴリー等）の手前までをブランド名として抽出する。
     OCRの検出順がバラバラでも、文中の「ブランド」をすべて試して有効な値を返す。
     """
-    s = full_text.replace("\n", " ").replace("\r", " ")
+    s = full_text.translate(_WS_TAB)
     if "ブランド" not in s:
         return ""
 
     def take_brand_from_rest(rest: str) -> str:
-        rest = re.sub(r"^[：:\s]+", "", rest[:60].strip())
-        part = re.split(r"\s*カテゴリ(?:ー)?\s*", rest)[0].strip()
-        part = re.split(r"\s{2,}|\d+円", part)[0].strip()
+        rest = _RE_LEADING_SEP.sub("", rest[:60].strip())
+        part = _RE_CATEGORY.split(rest)[0].strip()
+        part = _RE_BRAND_PART_END.split(part)[0].strip()
         for stop in ("ファッション", "メンズ", "レディース", "パンツ", "デニム", "シャツ", "スニーカー"):
             if stop in part:
                 part = part[: part.find(stop)].strip()
@@ -366,7 +438,7 @@ def extract_brand_from_text(full_text: str) -> str:
         if cand and cand not in BRAND_VALUE_EXCLUDE and _is_valid_brand(cand):
             return cand
         # アルファベット2語だけ抜く（JACOB COHEN など）
-        m = re.match(r"^([A-Za-z][A-Za-z0-9\s\-]+?)(?:\s|$|/|カテゴリ)", part)
+        m = _RE_ALPHA_BRAND.match(part)
         if m:
             val = _brand_between_dots(m.group(1).strip())
             if val and _is_valid_brand(val):
@@ -379,7 +451,7 @@ def extract_brand_from_text(full_text: str) -> str:
     if out:
         return out
     # 正規表現で「ブランド」直後のアルファベット塊を全文から検索（OCR順不同の保険）
-    for m in re.finditer(r"ブランド\s*[：:]?\s*([A-Za-z][A-Za-z0-9\s・\-]+?)(?=\s+カテゴリ|\s{2,}|\s*/\s*ファッション|$)", s):
+    for m in _RE_BRAND_FULL.finditer(s):
         val = _brand_between_dots(m.group(1).strip())
         if val and _is_valid_brand(val):
             return val
@@ -396,47 +468,594 @@ def extract_brand_from_text(full_text: str) -> str:
     return ""
 
 
-def same_product_group(top_a: str, full_a: str, top_b: str, full_b: str, min_overlap: int = 3) -> bool:
-    """2枚の画像が同一商品かどうか。上側テキストがもう一方の全文に含まれる、または十分な重なりがあれば True。"""
-    na = normalize_text(top_a)
-    nb = normalize_text(top_b)
-    fa = normalize_text(full_a)
-    fb = normalize_text(full_b)
+def _ngrams(s: str, n: int) -> frozenset:
+    """s に含まれる長さ n の部分文字列の集合"""
+    return frozenset(s[k : k + n] for k in range(len(s) - n + 1))
+
+
+def _group_signature(top: str, full: str, min_overlap: int = 3) -> tuple:
+    """same_product_group 用に1画像分を前計算する: (上側, 全文, 上側の n-gram, 全文の n-gram)"""
+    nt = normalize_text(top)
+    nf = normalize_text(full)
+    return (nt, nf, _ngrams(nt, min_overlap), _ngrams(nf, min_overlap))
+
+
+def _signatures_match(sig_a: tuple, sig_b: tuple, min_overlap: int = 3) -> bool:
+    """_group_signature 同士で same_product_group と同じ判定をする（n-gram 集合の共通部分で O(L)）"""
+    na, fa, tri_na, tri_fa = sig_a
+    nb, fb, tri_nb, tri_fb = sig_b
     if len(na) < min_overlap and len(nb) < min_overlap:
         return False
-    if na and na in fb:
+    # 上側テキストの共通部分が min_overlap 文字以上あれば同一とみなす（包含もここで拾える）
+    # 片方の集合が空なら isdisjoint は即 True なので、短い全文・上側はここで素通りする
+    if not tri_na.isdisjoint(tri_fb) or not tri_nb.isdisjoint(tri_fa):
+        return True
+    # min_overlap 未満の短い上側テキストは包含だけ見る（相手の全文より長ければ見るまでもない）
+    if 0 < len(na) < min_overlap and len(na) <= len(fb) and na in fb:
         return True
-    if nb and nb in fa:
+    if 0 < len(nb) < min_overlap and len(nb) <= len(fa) and nb in fa:
         return True
-    # 共通部分が min_overlap 文字以上あれば同一とみなす
-    for i in range(len(na) - min_overlap + 1):
-        sub = na[i : i + min_overlap]
-        if len(sub) >= min_overlap and sub in fb:
-            return True
-    for i in range(len(nb) - min_overlap + 1):
-        sub = nb[i : i + min_overlap]
-        if len(sub) >= min_overlap and sub in fa:
-            return True
     return False
 
 
+def _candidate_pairs(sigs: list, min_overlap: int = 3):
+    """
+    _signatures_match が True になる組 (i, j) をすべて返す（全ペア総当たりをしない）。
+    全文の n-gram → 画像 の転置インデックスを作り、上側テキストの n-gram を引くだけで
+    「上側の共通部分が全文にある」組が直接見つかる。min_overlap 未満の短い上側テキストだけ総当たりで包含を見る。
+    """
+    inv = defaultdict(list)
+    for j, sig in enumerate(sigs):
+        for g in sig[3]:
+            inv[g].append(j)
+    pairs = set()
+    for i, sig in enumerate(sigs):
+        top = sig[0]
+        if len(top) >= min_overlap:
+            for g in sig[2]:
+                for j in inv.get(g, ()):
+                    if j != i:
+                        pairs.add((min(i, j), max(i, j)))
+        elif top:
+            # 短い上側テキストが一致になるのは「相手の上側が min_overlap 以上」かつ「相手の全文に含まれる」ときだけ
+            # （相手側の n-gram で一致する組は相手の番で転置インデックスから拾える）
+            for j, (top_j, full_j, _, _) in enumerate(sigs):
+                if j == i or len(top_j) < min_overlap or len(full_j) < len(top):
+                    continue
+                if top in full_j:
+                    pairs.add((min(i, j), max(i, j)))
+    return sorted(pairs)
+
+
+def same_product_group(top_a: str, full_a: str, top_b: str, full_b: str, min_overlap: int = 3) -> bool:
+    """2枚の画像が同一商品かどうか。上側テキストがもう一方の全文に含まれる、または十分な重なりがあれば True。"""
+    return _signatures_match(
+        _group_signature(top_a, full_a, min_overlap),
+        _group_signature(top_b, full_b, min_overlap),
+        min_overlap,
+    )
+
+
+# OCR 結果のキャッシュ（画像の中身のハッシュ → JSON）。再実行時は OCR を飛ばす
+OCR_CACHE_DIR = PROJECT_ROOT / ".ocr_cache"
+
+
+def _file_digest(path: Path) -> str:
+    """ファイルの中身の blake2b ハッシュ（16バイト）"""
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+def _ocr_cache_key(digest, settings: str):
+    """画像の中身のハッシュ + OCR 設定からキャッシュキーを作る。digest が None なら None（キャッシュしない）"""
+    if digest is None:
+        return None
+    return hashlib.blake2b(f"{digest}|{settings}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _mercari_cache_settings() -> str:
+    """Mercari 領域OCR のキャッシュ用の設定。領域・前処理は screenshot_config.json で決まるので、その中身のハッシュを含める"""
+    return "mercari:" + (_file_digest(CONFIG_JSON) if CONFIG_JSON.exists() else "-")
+
+
+def _easyocr_cache_settings() -> str:
+    """EasyOCR のキャッシュ用の設定。切り出すときは範囲が変わると検出結果も変わるのでゾーン設定も含める"""
+    settings = f"easyocr:ja:w{OCR_MAX_WIDTH}"
+    if CROP_BEFORE_OCR:
+        settings += ":crop:" + json.dumps(ZONE_CONFIG, sort_keys=True)
+    return settings
+
+
+def _ocr_cache_load(key):
+    """キャッシュを読む。無い・壊れていれば None"""
+    if key is None:
+        return None
+    try:
+        with open(OCR_CACHE_DIR / f"{key}.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _ocr_cache_store(key, value) -> None:
+    """キャッシュを書く（失敗しても処理は続ける）"""
+    if key is None:
+        return
+    try:
+        OCR_CACHE_DIR.mkdir(exist_ok=True)
+        with open(OCR_CACHE_DIR / f"{key}.json", "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False, separators=(",", ":"))
+    except OSError:
+        pass
+
+
+# 見た目が同じ画像（保存し直し・形式変換でバイト列だけ違う）を知覚ハッシュで見つけてキャッシュを使い回す（REUSE_SIMILAR_OCR のときだけ）
+# pHash（64bit）のハミング距離がこれ以下、かつ画像サイズが同じなら同一画像とみなす
+PHASH_MAX_DISTANCE = 4
+
+
+def _image_phash(path: Path):
+    """(pHash の整数値, [w, h]) を返す。REUSE_SIMILAR_OCR が無効・読めなければ None"""
+    if not REUSE_SIMILAR_OCR:
+        return None
+    from PIL import Image
+    try:
+        with Image.open(path) as pil_im:
+            return int(str(imagehash.phash(pil_im)), 16), [pil_im.width, pil_im.height]
+    except Exception:
+        return None
+
+
+def _find_similar_digest(index: dict, ph):
+    """phash_index から ph に最も近い（距離 PHASH_MAX_DISTANCE 以下・同サイズ）画像の digest を返す。無ければ None"""
+    value, size = ph
+    best, best_dist = None, PHASH_MAX_DISTANCE + 1
+    for ph_hex, entry in index.items():
+        if entry.get("size") != size:
+            continue
+        dist = bin(int(ph_hex, 16) ^ value).count("1")
+        if dist < best_dist:
+            best, best_dist = entry.get("digest"), dist
+    return best
+
+
+def _lookup_ocr_cache(image_paths: list, settings: str) -> tuple:
+    """
+    各画像のキャッシュを引く。(digests, cached, phashes) を返す。
+    バイト列のハッシュで見つからなければ、知覚ハッシュが近い画像のキャッシュを使う（REUSE_SIMILAR_OCR のとき）。
+    phashes はキャッシュに無かった画像の pHash（OCR 後に _remember_phashes で登録する）。
+    """
+    index = _ocr_cache_load("phash_index") if REUSE_SIMILAR_OCR else None
+    digests, cached, phashes = {}, {}, {}
+    for path in image_paths:
+        try:
+            digests[path] = _file_digest(path)
+        except OSError:
+            digests[path] = None
+        value = _ocr_cache_load(_ocr_cache_key(digests[path], settings))
+        if value is None and REUSE_SIMILAR_OCR:
+            ph = _image_phash(path)
+            if ph is not None:
+                similar = _find_similar_digest(index or {}, ph)
+                if similar:
+                    value = _ocr_cache_load(_ocr_cache_key(similar, settings))
+                if value is None:
+                    phashes[path] = ph
+                else:
+                    # 次回からはバイト列のハッシュだけで引けるよう、この画像のキーでも保存しておく
+                    _ocr_cache_store(_ocr_cache_key(digests[path], settings), value)
+        cached[path] = value
+    return digests, cached, phashes
+
+
+def _dedupe_pending(pending: list, digests: dict, phashes: dict) -> tuple:
+    """
+    キャッシュに無かった画像のうち、中身が同じ（digest が同じ）か見た目がほぼ同じ（pHash が近い・同サイズ。REUSE_SIMILAR_OCR のときだけ phashes が入る）ものをまとめる。
+    (OCR する画像, {OCR を省略する画像: 代わりに結果を使う画像}) を返す。同じスクショを何枚も置いたときに1回だけ読む。
+    """
+    to_read, duplicates = [], {}
+    by_digest = {}  # digest → OCR する代表の画像
+    index = {}  # 代表の pHash（_find_similar_digest 用。phash_index と同じ形）
+    for path in pending:
+        digest = digests.get(path)
+        if digest is None:  # 読めない画像はそのまま OCR 側で警告を出す
+            to_read.append(path)
+            continue
+        similar = digest if digest in by_digest else None
+        ph = phashes.get(path)
+        if similar is None and ph is not None:
+            similar = _find_similar_digest(index, ph)
+        if similar is not None:
+            duplicates[path] = by_digest[similar]
+            continue
+        to_read.append(path)
+        by_digest[digest] = path
+        if ph is not None:
+            index[f"{ph[0]:016x}"] = {"digest": digest, "size": ph[1]}
+    return to_read, duplicates
+
+
+def _remember_phashes(phashes: dict, digests: dict) -> None:
+    """OCR した画像の pHash → digest を phash_index に追記する"""
+    if not phashes:
+        return
+    index = _ocr_cache_load("phash_index") or {}
+    for path, (value, size) in phashes.items():
+        if digests.get(path):
+            index[f"{value:016x}"] = {"digest": digests[path], "size": size}
+    _ocr_cache_store("phash_index", index)
+
+
+def _serialize_detections(detections: list) -> list:
+    """EasyOCR の detections を JSON 用に。bbox の4点は8個の float に平らにする"""
+    return [
+        [[float(v) for p in bbox for v in p[:2]], text, float(conf)]
+        for (bbox, text, conf) in detections
+    ]
+
+
+def _deserialize_detections(data: list) -> list:
+    """_serialize_detections の逆。bbox を [[x1,y1],…,[x4,y4]] に戻す"""
+    return [
+        ([flat[k : k + 2] for k in range(0, 8, 2)], text, conf)
+        for (flat, text, conf) in data
+    ]
+
+
+# EasyOCR: 1回の推論に渡す画像枚数（GPU ではまとめて流すほど速い）
+EASYOCR_BATCH_SIZE = 8
+# OCR 前に縮小する幅（iPhone スクショは約 1170px 幅。None/0 で縮小しない）
+OCR_MAX_WIDTH = 800
+# CPU で OCR するときのプロセス数（コアの半分。モデルのメモリと取り合わないように）
+OCR_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+def _easyocr_use_gpu() -> bool:
+    """
+    EasyOCR を GPU で動かすか。環境変数 EASYOCR_GPU=1/0 で指定、未指定なら CUDA が使えるかどうか。
+    """
+    env = os.environ.get("EASYOCR_GPU", "").strip().lower()
+    if env in ("0", "false", "no", "off"):
+        return False
+    try:
+        import torch
+    except ImportError:
+        return False
+    available = torch.cuda.is_available()
+    if env in ("1", "true", "yes", "on") and not available:
+        print("  - EASYOCR_GPU=1 ですが CUDA が使えないため CPU で実行します")
+    return available
+
+
+def _float_outputs(out, torch):
+    """autocast の bf16 出力を float32 に戻す（EasyOCR は結果を numpy に変換するが bf16 は変換できない）"""
+    if isinstance(out, torch.Tensor):
+        return out.float() if out.is_floating_point() else out
+    if isinstance(out, (tuple, list)):
+        return type(out)(_float_outputs(o, torch) for o in out)
+    return out
+
+
+def _autocast_bf16(module, torch) -> None:
+    """module の forward を CUDA の bf16 autocast 下で動かす（fp16 より認識精度が落ちにくい）"""
+    forward = module.forward
+
+    def forward_bf16(*args, **kwargs):
+        with torch.autocast("cuda", dtype=torch.bfloat16):
+            out = forward(*args, **kwargs)
+        return _float_outputs(out, torch)
+
+    module.forward = forward_bf16
+
+
+def _enable_bf16(reader) -> bool:
+    """GPU が bf16 に対応していれば検出・認識モデルを bf16 autocast にする。EASYOCR_BF16=0 で無効"""
+    if os.environ.get("EASYOCR_BF16", "").strip().lower() in ("0", "false", "no", "off"):
+        return False
+    import torch
+    if not torch.cuda.is_bf16_supported():
+        return False
+    for module in (getattr(reader, "detector", None), getattr(reader, "recognizer", None)):
+        if module is not None:
+            _autocast_bf16(module, torch)
+    return True
+
+
+def _create_easyocr_reader(easyocr, gpu: bool = False):
+    """EasyOCR の Reader を作る（CPU では quantize で軽量化）"""
+    # quantize=True: CPU 時は EasyOCR 自身が検出・認識モデルに torch.quantization.quantize_dynamic
+    # (qint8) をかける。ここで重ねて量子化する必要はない（GPU 時は無視される）
+    # cudnn_benchmark: GPU では入力サイズごとに最速の畳み込みを選ぶ（_readtext_batch で検出モデルの入力サイズを固定するので効く）
+    return easyocr.Reader(["ja"], gpu=gpu, quantize=True, cudnn_benchmark=gpu)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_cv2():
+    """OpenCV を初回だけ import する。無ければ None"""
+    try:
+        import cv2
+    except ImportError:
+        return None
+    return cv2
+
+
+@functools.lru_cache(maxsize=1)
+def _get_turbojpeg():
+    """PyTurboJPEG（libjpeg-turbo）を初回だけ用意する。無ければ None"""
+    try:
+        from turbojpeg import TurboJPEG, TJPF_RGB
+        return TurboJPEG(), TJPF_RGB
+    except Exception:  # ImportError / libturbojpeg が見つからない
+        return None
+
+
+def _jpeg_scaling_factor(width: int, max_width: int):
+    """デコード時に縮小できる JPEG の倍率（1/2, 1/4, 1/8）のうち、max_width を下回らない最小のもの。縮小不要なら None"""
+    if not max_width:
+        return None
+    factor = None
+    for denom in (2, 4, 8):
+        if width // denom < max_width:
+            break
+        factor = (1, denom)
+    return factor
+
+
+def _decode_rgb(path: Path, max_width: int = OCR_MAX_WIDTH):
+    """
+    画像を RGB の uint8 ndarray に直接デコードする（PIL → np.array の余分なコピーなし）。
+    JPEG は libjpeg-turbo、それ以外は cv2.imdecode（日本語パスでも読めるよう np.fromfile 経由）。
+    どちらも無い・読めない形式なら PIL にフォールバック。
+    JPEG は幅が max_width の2倍以上あればデコードの段階で 1/2〜1/8 に落とす（DCT スケーリング）。
+    幅は max_width 以上に保つので、残りの縮小は _downscale がやる。
+    """
+    if path.suffix.lower() in (".jpg", ".jpeg"):
+        tj = _get_turbojpeg()
+        if tj is not None:
+            jpeg, tjpf_rgb = tj
+            data = path.read_bytes()
+            try:
+                width = jpeg.decode_header(data)[0]
+                return jpeg.decode(
+                    data, pixel_format=tjpf_rgb, scaling_factor=_jpeg_scaling_factor(width, max_width)
+                )
+            except Exception:
+                pass  # turbojpeg が扱えない JPEG → 下の経路で読む
+    cv2 = _get_cv2()
+    if cv2 is not None:
+        bgr = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+        if bgr is not None:
+            return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    from PIL import Image
+    with Image.open(path) as pil_im:
+        if max_width and pil_im.format == "JPEG":
+            # JPEG だけ効く（draft は max_width 以上を保つ範囲で縮小倍率を選ぶ）
+            pil_im.draft("RGB", (max_width, max(1, pil_im.height * max_width // pil_im.width)))
+        if pil_im.mode != "RGB":
+            pil_im = pil_im.convert("RGB")
+        return np.asarray(pil_im)
+
+
+def _downscale(img_np, max_width: int = OCR_MAX_WIDTH, out=None):
+    """
+    幅が max_width を超えていれば縦横比を保って縮小する（INTER_AREA）。UI の文字はこの幅でも十分読める。
+    out（縮小後と同じ形の uint8 バッファ）を渡すとそこに書き込む（新しい配列を確保しない）。
+    """
+    h, w = img_np.shape[:2]
+    if not max_width or w <= max_width:
+        return img_np
+    size = (max_width, max(1, round(h * max_width / w)))
+    cv2 = _get_cv2()
+    if cv2 is not None:
+        if out is not None and out.shape == (size[1], size[0], *img_np.shape[2:]):
+            return cv2.resize(img_np, size, dst=out, interpolation=cv2.INTER_AREA)
+        return cv2.resize(img_np, size, interpolation=cv2.INTER_AREA)
+    from PIL import Image
+    return np.asarray(Image.fromarray(img_np).resize(size, Image.Resampling.BOX))
+
+
+# crop_before_ocr 時にゾーンの外側に足す余白（割合）。ゾーン境界にかかった行が切れないように
+OCR_CROP_MARGIN = 0.02
+
+
+def _ocr_crop_box(h: int, w: int):
+    """
+    crop_before_ocr のとき、OCR にかける範囲 (x0, y0, x1, y1)（brand_zone と商品名ゾーンを囲む四角）を返す。
+    無効なら None。product_name_zone が無ければ get_product_name_zone_text の既定範囲を含める。
+    """
+    if not CROP_BEFORE_OCR:
+        return None
+    zones = list(ZONE_CONFIG.values())
+    if "product_name_zone" not in ZONE_CONFIG:
+        zones.append({"x_min": 0.0, "x_max": 1.0, "y_min": 0.35, "y_max": 0.55})
+    x0 = max(0, int(w * (min(z["x_min"] for z in zones) - OCR_CROP_MARGIN)))
+    x1 = min(w, int(w * (max(z["x_max"] for z in zones) + OCR_CROP_MARGIN) + 0.5))
+    y0 = max(0, int(h * (min(z["y_min"] for z in zones) - OCR_CROP_MARGIN)))
+    y1 = min(h, int(h * (max(z["y_max"] for z in zones) + OCR_CROP_MARGIN) + 0.5))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def _shift_detections(detections: list, h: int, w: int) -> list:
+    """切り出した範囲で得た detections の bbox を元画像の座標に戻す"""
+    box = _ocr_crop_box(h, w)
+    if box is None or (box[0] == 0 and box[1] == 0):
+        return detections
+    x0, y0 = box[0], box[1]
+    return [
+        ([[x + x0, y + y0] for (x, y) in bbox], text, conf)
+        for (bbox, text, conf) in detections
+    ]
+
+
+def _load_rgb(path: Path, out=None):
+    """
+    画像を RGB の ndarray で読み込み、OCR 用に縮小して (h, w, img_np) を返す。読めなければ警告して None。
+    h, w は縮小後の大きさ（ゾーン判定は割合なのでそのまま使える）。
+    crop_before_ocr のときの img_np は _ocr_crop_box の範囲だけ（OCR 後に _shift_detections で戻す）。
+    out: 縮小後の画像を書き込む使い回しのバッファ（形が合うときだけ使う）。
+    """
+    try:
+        img_np = _downscale(_decode_rgb(path), out=None if CROP_BEFORE_OCR else out)
+    except Exception as e:
+        print(f"警告: {path.name} を読み飛ばします ({e})")
+        return None
+    h, w = img_np.shape[:2]
+    box = _ocr_crop_box(h, w)
+    if box is not None:
+        x0, y0, x1, y1 = box
+        img_np = np.ascontiguousarray(img_np[y0:y1, x0:x1])
+    return h, w, img_np
+
+
+# CPU ワーカープロセスごとの EasyOCR Reader（_easyocr_worker_init で1回だけ作る）
+_WORKER_READER = None
+
+
+def _easyocr_worker_init() -> None:
+    """ワーカー1つにつき1スレッドで推論させ（プロセス数 × スレッド数の取り合いを防ぐ）、Reader を作る"""
+    global _WORKER_READER
+    os.environ["OMP_NUM_THREADS"] = "1"
+    import easyocr
+    import torch
+    torch.set_num_threads(1)
+    _WORKER_READER = _create_easyocr_reader(easyocr, gpu=False)
+
+
+def _easyocr_worker_process(path: Path):
+    """ワーカー内で1画像を OCR して (h, w, detections) を返す。読めなければ None"""
+    decoded = _load_rgb(path)
+    if decoded is None:
+        return None
+    h, w, img_np = decoded
+    return h, w, _shift_detections(_WORKER_READER.readtext(img_np), h, w)
+
+
+def _compile_reader(reader) -> dict:
+    """
+    環境変数 EASYOCR_COMPILE=1 のとき、検出・認識モデルを torch.compile(mode="reduce-overhead") に置き換える。
+    コンパイルは最初の推論時に走るので、失敗したら戻せるよう元のモジュールを {名前: モジュール} で返す（無効なら {}）。
+    """
+    if os.environ.get("EASYOCR_COMPILE", "").strip().lower() not in ("1", "true", "yes", "on"):
+        return {}
+    import torch
+    if not hasattr(torch, "compile"):
+        return {}
+    originals = {}
+    for name in ("detector", "recognizer"):
+        module = getattr(reader, name, None)
+        if module is not None:
+            originals[name] = module
+            setattr(reader, name, torch.compile(module, mode="reduce-overhead", fullgraph=False))
+    return originals
+
+
+def _median_canvas(imgs: list) -> tuple:
+    """バッチ推論で全画像をそろえる大きさ (n_height, n_width)。入力サイズの中央値"""
+    heights = sorted(img.shape[0] for img in imgs)
+    widths = sorted(img.shape[1] for img in imgs)
+    return heights[len(heights) // 2], widths[len(widths) // 2]
+
+
+def _warm_up_batched(reader, canvas: tuple) -> None:
+    """
+    本番と同じ形（EASYOCR_BATCH_SIZE 枚 × canvas の大きさ）の空画像を1回流し、検出モデルの
+    cuDNN アルゴリズム選択・torch.compile を本番の前に済ませる。
+    空画像では文字が見つからないので認識モデルは温まらない（認識側は切り出しの枚数・幅が画像ごとに違う）。
+    """
+    n_height, n_width = canvas
+    blank = np.zeros((n_height, n_width, 3), dtype=np.uint8)
+    reader.readtext_batched(
+        [blank] * EASYOCR_BATCH_SIZE, n_width=n_width, n_height=n_height, batch_size=EASYOCR_BATCH_SIZE
+    )
+
+
+def _readtext_batch(reader, imgs: list, canvas: tuple = None) -> list:
+    """
+    画像リストをまとめて OCR し、画像ごとの detections を返す。
+    readtext_batched は全画像を canvas (n_height, n_width)（省略時は入力の中央値）にリサイズして推論するので、
+    bbox は元画像の座標に戻してから返す。
+    """
+    if not imgs:
+        return []
+    n_height, n_width = canvas or _median_canvas(imgs)
+    results = reader.readtext_batched(imgs, n_width=n_width, n_height=n_height, batch_size=EASYOCR_BATCH_SIZE)
+    out = []
+    for img, detections in zip(imgs, results):
+        sx = img.shape[1] / n_width
+        sy = img.shape[0] / n_height
+        if sx == 1 and sy == 1:
+            out.append(detections)
+            continue
+        out.append([
+            ([[x * sx, y * sy] for (x, y) in bbox], text, conf)
+            for (bbox, text, conf) in detections
+        ])
+    return out
+
+
+def _easyocr_result(path: Path, detections: list, h: int, w: int) -> dict:
+    """EasyOCR の検出結果から1画像分の image_results 要素を作る"""
+    top_text = get_text_in_top_portion(detections, h)
+    full_text = get_full_text(detections)
+    product_name_zone = get_product_name_zone_text(detections, h, w)
+    brand = extract_brand_from_detections(detections, h, w)
+    if not brand:
+        brand = extract_brand_from_text(full_text)
+    has_brand = "ブランド" in full_text
+    return {
+        "path": path,
+        "top_text": top_text,
+        "full_text": full_text,
+        "product_name_zone": product_name_zone,
+        "brand": brand,
+        "has_brand_label": has_brand,
+    }
+
+
+def _write_json(path: Path, data) -> None:
+    """JSON を UTF-8・インデント2で書き出す（orjson があれば高速に、無ければ標準の json）"""
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _iter_product_ids(path: Path):
+    """
+    data.json（商品の配列）の各 id を順に返す。ijson があればストリームで読み、id 以外の値は Python オブジェクトにしない。
+    無ければ丸ごと json.load する。
+    """
+    if ijson is not None:
+        with open(path, "rb") as f:
+            for item in ijson.items(f, "item.id"):
+                yield item
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for item in data:
+        yield item.get("id", "")
+
+
 def main():
     use_mercari_ocr = _config_use_mercari_iphone_ocr()
-    if not use_mercari_ocr:
-        try:
-            import easyocr
-        except ImportError:
-            print("easyocr が入っていません。次のコマンドでインストールしてください:")
-            print("  pip install easyocr")
-            return 1
+    # easyocr は import するだけで torch を読み込む（数秒）ので、ここでは有無だけ確認し、
+    # 実際の import は画像があって GPU 経路を使うときまで遅らせる（CPU ワーカーは各自で import する）
+    if not use_mercari_ocr and importlib.util.find_spec("easyocr") is None:
+        print("easyocr が入っていません。次のコマンドでインストールしてください:")
+        print("  pip install easyocr")
+        return 1
 
     INPUT_DIR.mkdir(exist_ok=True)
     IMAGES_DIR.mkdir(exist_ok=True)
 
-    image_paths = []
-    for ext in ("*.png", "*.jpg", "*.jpeg", "*.webp"):
-        image_paths.extend(INPUT_DIR.glob(ext))
-    image_paths = sorted([p for p in image_paths if p.is_file()])
+    # 1回の scandir で拡張子を見て拾う（拡張子ごとに glob し直さない。is_file は scandir の結果を使う）
+    with os.scandir(INPUT_DIR) as entries:
+        image_paths = sorted(
+            Path(e.path) for e in entries
+            if os.path.splitext(e.name)[1].lower() in IMAGE_EXTENSIONS and e.is_file()
+        )
 
     if not image_paths:
         print(f"{INPUT_DIR} に画像がありません。スクショを置いてから再実行してください。")
@@ -455,11 +1074,40 @@ def main():
                 print("mercari_ocr を読み込めません。scripts/mercari_ocr.py と scripts/ocr_preprocess.py を確認してください。")
                 return 1
         print("Mercari iPhone 用の領域OCR（Tesseract）で読み取ります...")
-        for path in image_paths:
+        # 同じ画像・同じ設定ならキャッシュ済みの結果を使う（設定ファイルの中身もキーに含める）
+        settings = _mercari_cache_settings()
+        digests, results, phashes = _lookup_ocr_cache(image_paths, settings)
+        pending = [path for path in image_paths if results[path] is None]
+        to_read, duplicates = _dedupe_pending(pending, digests, phashes)
+        if pending:
+            # 画像ごとに独立なのでプロセス並列でまとめて読む（失敗したら1枚ずつ読み直す）
             try:
-                result = mercari_ocr.extract_from_image(path, CONFIG_JSON)
-            except Exception as e:
-                print(f"警告: {path.name} を読み飛ばします ({e})")
+                batch_results = mercari_ocr.extract_from_images(to_read, CONFIG_JSON, workers=OCR_WORKERS)
+            except Exception:
+                batch_results = [None] * len(to_read)
+            for path, result in zip(to_read, batch_results):
+                if result is None:
+                    try:
+                        result = mercari_ocr.extract_from_image(path, CONFIG_JSON)
+                    except Exception as e:
+                        print(f"警告: {path.name} を読み飛ばします ({e})")
+                        continue
+                results[path] = result
+                # 全部空（Tesseract が無い・画像が読めない等）はキャッシュしない
+                if any(result.get(k) for k in ("raw_product_text", "raw_brand_text", "raw_price_text")):
+                    _ocr_cache_store(_ocr_cache_key(digests[path], settings), result)
+                else:
+                    phashes.pop(path, None)
+            # 同じ・ほぼ同じ画像には代表の結果をそのまま使う（代表がキャッシュされたときだけこの画像のキーでも保存）
+            for path, rep in duplicates.items():
+                results[path] = results[rep]
+                if rep in phashes and results[rep] is not None:
+                    _ocr_cache_store(_ocr_cache_key(digests[path], settings), results[rep])
+                phashes.pop(path, None)
+            _remember_phashes({p: ph for p, ph in phashes.items() if results[p] is not None}, digests)
+        for path in image_paths:
+            result = results[path]
+            if result is None:
                 continue
             raw_product = (result.get("raw_product_text") or "")[:300]
             raw_brand = (result.get("raw_brand_text") or "")[:200]
@@ -478,37 +1126,99 @@ def main():
                 "raw_price_text": raw_price,
             })
     else:
-        # EasyOCR (従来)
-        print("OCR を読み込み中（初回はモデルダウンロードで時間がかかります）...")
-        reader = easyocr.Reader(["ja"], gpu=False)
-        import numpy as np
-        from PIL import Image
+        # EasyOCR (従来)。検出結果 (h, w, detections) を画像の中身ごとにキャッシュする
+        easyocr_settings = _easyocr_cache_settings()
+        digests, cached_out, phashes = _lookup_ocr_cache(image_paths, easyocr_settings)
+        ocr_out = {}
+        for path, cached in cached_out.items():
+            if cached is not None:
+                ocr_out[path] = (cached["h"], cached["w"], _deserialize_detections(cached["detections"]))
+        pending = [path for path in image_paths if path not in ocr_out]
+        to_read, duplicates = _dedupe_pending(pending, digests, phashes)
+        if pending:
+            print("OCR を読み込み中（初回はモデルダウンロードで時間がかかります）...")
+            new_out = {}
+            if not _easyocr_use_gpu():
+                # CPU: 画像ごとにプロセス並列（各ワーカーが Reader を1つずつ持つ）
+                print(f"  - EasyOCR: CPU / {OCR_WORKERS} プロセスで並列処理")
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_easyocr_worker_init) as ex:
+                    for path, out in zip(to_read, ex.map(_easyocr_worker_process, to_read)):
+                        if out is not None:
+                            new_out[path] = out
+            else:
+                import easyocr
+                reader = _create_easyocr_reader(easyocr, gpu=True)
+                bf16 = _enable_bf16(reader)
+                # bf16 の forward ごとコンパイルする（autocast の後に適用）
+                compiled = _compile_reader(reader)
+                print(
+                    f"  - EasyOCR: GPU{' (bf16)' if bf16 else ''}{' (torch.compile)' if compiled else ''}"
+                    f" / {EASYOCR_BATCH_SIZE} 枚ずつバッチ処理"
+                )
+                canvas = []  # 最初のバッチで決めた (n_height, n_width) を全バッチで使う（形が変わらないので再チューニングなし）
+                # canvas と同じ形に縮小される画像（ふつうは全部）はこのバッファに直接書く。
+                # OCR 中のバッチと先読み中のバッチの2組を交互に使い、画像ごとに配列を確保し直さない
+                slots = []
+                warmed = []
+
+                def run_batch(batch):
+                    """batch: [(path, h, w, img_np)] をまとめて OCR して new_out に入れる"""
+                    imgs = [b[3] for b in batch]
+                    if not warmed:
+                        warmed.append(True)
+                        try:
+                            # 検出モデルの入力は全バッチ同じ形（canvas・EASYOCR_BATCH_SIZE 枚）なので、そのコンパイルと
+                            # チューニングはここで1回だけ。最後の端数バッチと認識モデルは形が変わるので、そこでは走り直すことがある
+                            _warm_up_batched(reader, canvas[0])
+                        except Exception as e:
+                            if not compiled:
+                                raise
+                            print(f"  - torch.compile に失敗したため通常実行に戻します ({e})")
+                            for name, module in compiled.items():
+                                setattr(reader, name, module)
+                            _warm_up_batched(reader, canvas[0])
+                    for (path, h, w, _), detections in zip(batch, _readtext_batch(reader, imgs, canvas[0])):
+                        new_out[path] = (h, w, _shift_detections(detections, h, w))
+
+                # デコードはスレッド並列（cv2 / libjpeg-turbo は GIL を手放す）。
+                # 1バッチ先を読みながら今のバッチを OCR する（全画像を一度にメモリに載せない）
+                from concurrent.futures import ThreadPoolExecutor
+                chunks = [to_read[k : k + EASYOCR_BATCH_SIZE] for k in range(0, len(to_read), EASYOCR_BATCH_SIZE)]
+                with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as decode_pool:
+                    upcoming = [decode_pool.submit(_load_rgb, path) for path in chunks[0]]
+                    for k, chunk in enumerate(chunks):
+                        decoded = [f.result() for f in upcoming]
+                        batch = [(path, *d) for path, d in zip(chunk, decoded) if d is not None]
+                        if batch and not canvas:
+                            canvas.append(_median_canvas([b[3] for b in batch]))
+                            slots.append(np.empty((2, EASYOCR_BATCH_SIZE, *canvas[0], 3), dtype=np.uint8))
+                        if k + 1 < len(chunks):
+                            ring = slots[0][(k + 1) % 2] if slots else [None] * EASYOCR_BATCH_SIZE
+                            upcoming = [
+                                decode_pool.submit(_load_rgb, path, ring[i]) for i, path in enumerate(chunks[k + 1])
+                            ]
+                        if batch:
+                            run_batch(batch)
+            # 同じ・ほぼ同じ画像には代表の検出結果をそのまま使う
+            for path, rep in duplicates.items():
+                if rep in new_out:
+                    new_out[path] = new_out[rep]
+                phashes.pop(path, None)
+            for path, (h, w, detections) in new_out.items():
+                value = {"h": h, "w": w, "detections": _serialize_detections(detections)}
+                _ocr_cache_store(_ocr_cache_key(digests[path], easyocr_settings), value)
+            _remember_phashes({p: ph for p, ph in phashes.items() if p in new_out}, digests)
+            ocr_out.update(new_out)
         for path in image_paths:
-            try:
-                with Image.open(path) as pil_im:
-                    h, w = pil_im.height, pil_im.width
-                    if pil_im.mode != "RGB":
-                        pil_im = pil_im.convert("RGB")
-                    img_np = np.array(pil_im)
-            except Exception as e:
-                print(f"警告: {path.name} を読み飛ばします ({e})")
-                continue
-            detections = reader.readtext(img_np)
-            top_text = get_text_in_top_portion(detections, h)
-            full_text = get_full_text(detections)
-            product_name_zone = get_product_name_zone_text(detections, h, w)
-            brand = extract_brand_from_detections(detections, h, w)
-            if not brand:
-                brand = extract_brand_from_text(full_text)
-            has_brand = "ブランド" in full_text
-            image_results.append({
-                "path": path,
-                "top_text": top_text,
-                "full_text": full_text,
-                "product_name_zone": product_name_zone,
-                "brand": brand,
-                "has_brand_label": has_brand,
-            })
+            if path in ocr_out:
+                h, w, detections = ocr_out[path]
+                image_results.append(_easyocr_result(path, detections, h, w))
+    cached_count = len(image_paths) - len(pending)
+    if cached_count:
+        print(f"  - キャッシュ済み: {cached_count} 枚（{OCR_CACHE_DIR.name}/ を消すと読み直します）")
+    if duplicates:
+        print(f"  - 同じ・ほぼ同じ画像: {len(duplicates)} 枚（OCR を省略し、同じ見た目の画像の結果を使いました）")
 
     # デバッグ: OCRで読み取った内容をファイルに保存（ブランド・商品名が取れないときに確認用）
     debug_path = PROJECT_ROOT / "ocr_debug.json"
@@ -527,8 +1237,7 @@ def main():
             }
             for r in image_results
         ]
-        with open(debug_path, "w", encoding="utf-8") as f:
-            json.dump(debug_data, f, ensure_ascii=False, indent=2)
+        _write_json(debug_path, debug_data)
         print(f"  - デバッグ: {debug_path} に各画像のOCR結果を保存しました")
     except Exception as e:
         print(f"  - デバッグ保存スキップ: {e}")
@@ -536,26 +1245,30 @@ def main():
     # 同一商品でグループ化（上側テキストの一致で判定）
     n = len(image_results)
     parent = list(range(n))
+    rank = [0] * n
 
     def find(x):
-        if parent[x] != x:
-            parent[x] = find(parent[x])
-        return parent[x]
+        # 再帰せずに根を探す。たどりながら1つ飛ばしに付け替える（経路半減）
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
 
     def union(x, y):
+        # 低い木を高い木の下に付ける（ランク併合。木が一列に伸びない）
         px, py = find(x), find(y)
-        if px != py:
-            parent[px] = py
-
-    for i in range(n):
-        for j in range(i + 1, n):
-            if same_product_group(
-                image_results[i]["top_text"],
-                image_results[i]["full_text"],
-                image_results[j]["top_text"],
-                image_results[j]["full_text"],
-            ):
-                union(i, j)
+        if px == py:
+            return
+        if rank[px] < rank[py]:
+            px, py = py, px
+        parent[py] = px
+        if rank[px] == rank[py]:
+            rank[px] += 1
+
+    # 正規化と n-gram 集合は画像ごとに1回だけ作る
+    sigs = [_group_signature(r["top_text"], r["full_text"]) for r in image_results]
+    for i, j in _candidate_pairs(sigs):
+        union(i, j)
 
     groups = {}
     for i in range(n):
@@ -568,11 +1281,8 @@ def main():
     next_id_num = 1
     if DATA_JSON.exists():
         try:
-            with open(DATA_JSON, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for item in data:
-                mid = item.get("id", "")
-                m = re.match(r"^.*?(\d+)$", mid)
+            for mid in _iter_product_ids(DATA_JSON):
+                m = _RE_ID_NUM.search(mid)
                 if m:
                     next_id_num = max(next_id_num, int(m.group(1)) + 1)
         except Exception:
@@ -596,30 +1306,41 @@ def main():
         return s
 
     def get_product_name_from_group(indices: list) -> str:
-        title_candidates = [image_results[i] for i in indices if not image_results[i].get("has_brand_label")]
-        if not title_candidates:
+        # 1回の走査で「商品名ゾーンが最長の画像」と「top_text が最長の画像」を両方決める（同じ長さなら先のもの）
+        best_zone = best = None
+        zone_len = top_len = -1
+        for i in indices:
+            r = image_results[i]
+            if r.get("has_brand_label"):
+                continue
+            n = len(r.get("product_name_zone") or "")
+            if n > zone_len:
+                zone_len, best_zone = n, r
+            n = len(r.get("top_text") or "")
+            if n > top_len:
+                top_len, best = n, r
+        if best_zone is None:
             return "（商品名を編集してください）"
         # まず「商品名ゾーン」（画像直下・アイコン直下の大きいテキスト）を使う
-        best_zone = max(title_candidates, key=lambda r: len(r.get("product_name_zone") or ""))
         raw = (best_zone.get("product_name_zone") or "").strip()
         raw = _trim_product_name_raw(raw, max_len=100)
         if not raw or not _looks_like_product_name(raw):
             # ゾーンで取れない場合は top_text を優先（画面上部＝タイトル）、長い場合は先頭120文字で切ってからトリム
-            best = max(title_candidates, key=lambda r: len(r.get("top_text") or ""))
             top = (best.get("top_text") or "").strip()
             full = (best.get("full_text") or "").strip()
             raw = (top or full).strip()
             raw = _trim_product_name_raw(raw, max_len=120)
         if not raw or not _looks_like_product_name(raw):
             return "（商品名を編集してください）"
-        return re.sub(r"\s+", " ", raw)[:120]
+        return _RE_WS.sub(" ", raw)[:120]
 
     today = date.today().isoformat()
     suggested = []
     for root, indices in groups.items():
         indices = sorted(indices)
+        # 「ブランド」項目が写っている画像を先に見て、最初に取れたブランドを使う
         brand = "その他"
-        for idx in indices:
+        for idx in sorted(indices, key=lambda i: not image_results[i]["has_brand_label"]):
             r = image_results[idx]
             if r["brand"]:
                 brand = r["brand"]
@@ -636,7 +1357,7 @@ def main():
             ext = src.suffix.lower()
             dest_name = f"{product_id}_{k}{ext}"
             dest = IMAGES_DIR / dest_name
-            shutil.copy2(src, dest)
+            fileops.fast_copy(src, dest)
             image_names.append(f"images/{dest_name}")
 
         suggested.append({
@@ -649,8 +1370,7 @@ def main():
             "created_at": today,
         })
 
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(suggested, f, ensure_ascii=False, indent=2)
+    _write_json(OUTPUT_JSON, suggested)
 
     print(f"\n処理完了: {len(groups)} 商品にグループ化しました（ブランドごとに商品がぶら下がる形で出力）。")
     print(f"  - 結果: {OUTPUT_JSON}")
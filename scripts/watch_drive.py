@@ -7,9 +7,11 @@ from __future__ import annotations
 
 import json
 import logging
+import queue
 import re
 import shutil
 import sys
+import threading
 import time
 from datetime import date
 from pathlib import Path
@@ -19,6 +21,12 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+try:
+    from scripts import compact_jsonl, fileops
+except ImportError:
+    import compact_jsonl
+    import fileops
+
 # ログ設定
 logging.basicConfig(
     level=logging.INFO,
@@ -30,6 +38,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# product-XXX の末尾の番号
+_ID_RE = re.compile(r"(\d+)$")
+
+# この枚数までのまとめ届きは tesseract でもプロセスを立てずにこのプロセスで読む。
+# 監視の1回分は数枚のことが多く、毎回プロセスを起こしてモデルを読み直すより、
+# 常駐している領域スレッドと tesserocr のセッションを使い回すほうが速い。
+IN_PROCESS_OCR_MAX = 8
+
 
 def load_watch_config() -> dict:
     """watch_config.json を読み込む。"""
@@ -40,6 +56,8 @@ def load_watch_config() -> dict:
         "images_dir": "images",
         "processed_dir": "processed",
         "failed_dir": "failed",
+        "ocr_backend": "tesseract",
+        "model_dir": "",
     }
     if not config_path.exists():
         logger.warning("watch_config.json が見つかりません。デフォルトを使用します。")
@@ -55,33 +73,132 @@ def load_watch_config() -> dict:
     return default
 
 
-def get_next_product_id(data_json_path: Path) -> str:
-    """data.json から既存の product-XXX の最大番号を取得し、次の id を返す。"""
-    if not data_json_path.exists():
-        return "product-001"
-    try:
-        with open(data_json_path, "r", encoding="utf-8") as f:
-            items = json.load(f)
-    except Exception:
-        return "product-001"
-    if not isinstance(items, list):
-        return "product-001"
-    max_num = 0
-    for item in items:
-        mid = item.get("id", "")
-        m = re.match(r"^.*?(\d+)$", mid)
-        if m:
-            max_num = max(max_num, int(m.group(1)))
-    return f"product-{max_num + 1:03d}"
+class ProductStore:
+    """
+    data.json の中身をメモリに持ち、次の id の払い出しと追記をまとめて行う。
+    1件ごとにファイル全体を読み直して書き直さず、最後の追記から flush_delay 秒たったら1回だけ書き出す
+    （flush_delay が 0 なら追記のたびに書く）。watchdog のスレッドから同時に呼ばれてもよいようロックで守る。
+    書き出す前に data.json が外で編集されていたら読み直し、未保存の追記をその後ろに足す。
+    追記はまず data.jsonl（compact_jsonl.journal_path）に1行ずつ書くので、書き出す前に落ちても失われない
+    （次の起動時に compact_jsonl.compact で data.json に取り込む）。
+    """
+
+    def __init__(self, data_json_path: Path, flush_delay: float = 2.0):
+        self.path = data_json_path
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._items: list | None = None  # 最後に読んだ・書いた data.json の中身
+        self._pending: list[dict] = []  # まだ書き出していない追記
+        self._mtime_ns: int | None = None
+        self._next_num = 1
+        self._journal_path = compact_jsonl.journal_path(data_json_path)
+        self._journal = None  # 追記ログのファイル（add のたびに開き直さない）
+        try:
+            with self._lock:
+                merged = compact_jsonl.compact(self.path)
+                if merged:
+                    logger.info("前回書き出せなかった %d 件を data.json に取り込みました", merged)
+                self._sync()
+        except Exception as e:
+            # 壊れた data.json を上書きしないよう、読めるまで reserve_id は失敗させる（次の呼び出しで読み直す）
+            logger.error("data.json の読み込みに失敗: %s", e)
+
+    def _stat_mtime_ns(self) -> int | None:
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _sync(self) -> None:
+        """data.json が前回読んだ・書いた時から変わっていれば読み直す（ロックを持って呼ぶ）。"""
+        mtime_ns = self._stat_mtime_ns()
+        if self._items is not None and mtime_ns == self._mtime_ns:
+            return
+        items: list = []
+        if mtime_ns is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            if not isinstance(items, list):
+                items = []
+        self._items = items
+        self._mtime_ns = mtime_ns
+        for item in items:
+            mid = item.get("id", "") if isinstance(item, dict) else ""
+            m = _ID_RE.search(mid) if isinstance(mid, str) else None
+            if m:
+                self._next_num = max(self._next_num, int(m.group(1)) + 1)
+
+    def reserve_id(self) -> str:
+        """次の product-XXX を払い出す（同時に呼ばれても重ならない）。"""
+        with self._lock:
+            self._sync()
+            product_id = f"product-{self._next_num:03d}"
+            self._next_num += 1
+            return product_id
+
+    def add(self, item: dict) -> None:
+        """1件追記する。書き出しは flush_delay 後（それまでの追記とまとめて1回）。"""
+        with self._lock:
+            if self._journal is None:
+                self._journal_path.parent.mkdir(parents=True, exist_ok=True)
+                self._journal = open(self._journal_path, "a", encoding="utf-8")
+            self._journal.write(json.dumps(item, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            self._pending.append(item)
+            if self.flush_delay <= 0:
+                self._flush_locked()
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        """未保存の追記を data.json に書き出す（監視の終了時にも呼ぶ）。"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        try:
+            self._sync()
+        except Exception as e:
+            logger.error("data.json の読み込みに失敗したため書き出しを保留します: %s", e)
+            return
+        items = self._items + self._pending
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        self._items = items
+        self._pending.clear()
+        self._mtime_ns = self._stat_mtime_ns()
+        # data.json に入ったので追記ログは空にする（ここで落ちても compact が同じ id を二重に足さない）
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._journal_path.unlink(missing_ok=True)
 
 
 def process_new_image(
     image_path: Path,
     config: dict,
+    reader=None,
+    store: ProductStore | None = None,
+    result: dict | None = None,
 ) -> bool:
     """
     新規画像 1 枚を処理: OCR → images/ にコピー → data.json に追記 → 元ファイルを processed/ へ移動。
     失敗時は failed/ へ移動して False を返す。
+    reader: ocr_backend が easyocr のとき、main() で1回だけ作った EasyOCR Reader を使い回す。
+    store: 監視中に使い回す ProductStore（data.json への書き出しはまとめて行われる）。
+      省略時はこの1枚のためだけに data.json を読み、その場で書き出す。
+    result: process_new_images でまとめて OCR 済みの結果（あれば OCR を飛ばす）。
     """
     watch_folder = Path(config["watch_folder"])
     data_json_path = PROJECT_ROOT / config["data_json"]
@@ -98,26 +215,31 @@ def process_new_image(
     processed_dir.mkdir(parents=True, exist_ok=True)
     failed_dir.mkdir(parents=True, exist_ok=True)
     images_dir.mkdir(parents=True, exist_ok=True)
+    if store is None:
+        store = ProductStore(data_json_path, flush_delay=0)
 
     try:
-        # mercari_ocr を呼び出し
-        try:
-            from scripts import mercari_ocr
-        except ImportError:
-            import mercari_ocr
-        config_path = PROJECT_ROOT / "screenshot_config.json"
-        result = mercari_ocr.extract_from_image(image_path, config_path)
+        if result is None:
+            # mercari_ocr を呼び出し
+            try:
+                from scripts import mercari_ocr
+            except ImportError:
+                import mercari_ocr
+            config_path = PROJECT_ROOT / "screenshot_config.json"
+            result = mercari_ocr.extract_from_image(
+                image_path, config_path, backend=config["ocr_backend"], reader=reader
+            )
         brand = (result.get("brand") or "").strip() or "その他"
         product_name = (result.get("product_name") or "").strip() or "（商品名を編集してください）"
 
         # 次の id を取得
-        product_id = get_next_product_id(data_json_path)
+        product_id = store.reserve_id()
         ext = image_path.suffix.lower()
         if ext not in (".png", ".jpg", ".jpeg", ".webp"):
             ext = ".png"
         image_filename = f"{product_id}_1{ext}"
         dest_image = images_dir / image_filename
-        shutil.copy2(image_path, dest_image)
+        fileops.fast_copy(image_path, dest_image)
         image_ref = f"images/{image_filename}"
 
         # data.json に追記
@@ -130,20 +252,7 @@ def process_new_image(
             "screenshot_count": 1,
             "created_at": date.today().isoformat(),
         }
-        if data_json_path.exists():
-            try:
-                with open(data_json_path, "r", encoding="utf-8") as f:
-                    data_list = json.load(f)
-            except Exception as e:
-                logger.error("data.json の読み込みに失敗: %s", e)
-                raise
-            if not isinstance(data_list, list):
-                data_list = []
-        else:
-            data_list = []
-        data_list.append(new_item)
-        with open(data_json_path, "w", encoding="utf-8") as f:
-            json.dump(data_list, f, ensure_ascii=False, indent=2)
+        store.add(new_item)
 
         logger.info("追加しました: id=%s brand=%s product_name=%s", product_id, brand, product_name[:30])
 
@@ -176,35 +285,111 @@ def process_new_image(
         return False
 
 
+def process_new_images(
+    image_paths: list[Path],
+    config: dict,
+    reader=None,
+    store: ProductStore | None = None,
+) -> list[bool]:
+    """
+    まとめて届いた新規画像を処理する。OCR は mercari_ocr.extract_from_images で一度に行い
+    （easyocr なら全画像のゾーンをまとめてバッチ推論、tesseract は IN_PROCESS_OCR_MAX 枚まではこのプロセスで、
+    それより多ければプロセス並列）、
+    その後は1枚ずつ process_new_image と同じ流れ（コピー → 追記 → processed/ へ移動）。
+    data.json はバッチの最後に1回だけ書き出す。まとめての OCR に失敗したら1枚ずつ読み直す。
+    """
+    if store is None:
+        store = ProductStore(PROJECT_ROOT / config["data_json"])
+    results: list = [None] * len(image_paths)
+    if len(image_paths) > 1:
+        try:
+            try:
+                from scripts import mercari_ocr
+            except ImportError:
+                import mercari_ocr
+            config_path = PROJECT_ROOT / "screenshot_config.json"
+            workers = 1 if len(image_paths) <= IN_PROCESS_OCR_MAX else None
+            results = mercari_ocr.extract_from_images(
+                image_paths, config_path, workers=workers, backend=config["ocr_backend"], reader=reader
+            )
+        except Exception as e:
+            logger.warning("まとめての OCR に失敗したため1枚ずつ読み直します: %s", e)
+            results = [None] * len(image_paths)
+    ok = [
+        process_new_image(path, config, reader, store, result)
+        for path, result in zip(image_paths, results)
+    ]
+    store.flush()
+    return ok
+
+
 def is_image_file(path: Path) -> bool:
     return path.suffix.lower() in (".png", ".jpg", ".jpeg")
 
 
 class NewImageHandler:
-    """新規ファイルのみ処理する watchdog ハンドラ。"""
+    """
+    新規ファイルのみ処理する watchdog ハンドラ。
+    イベントはキューに積むだけで、処理は専用のスレッド1本が行う（watchdog のスレッドを止めない）。
+    最後のイベントから debounce_secs 秒たつまで集め、まとめて process_new_images に渡す
+    （同期ドライブで書き込み中のファイルを待つのも兼ねる）。data.json に書くのもこのスレッドだけ。
+    """
 
-    def __init__(self, config: dict):
+    def __init__(
+        self,
+        config: dict,
+        reader=None,
+        store: ProductStore | None = None,
+        debounce_secs: float = 2.0,
+        max_batch: int = 32,
+    ):
         self.config = config
-        self._processed_paths: set[str] = set()
+        self.reader = reader
+        self.store = store or ProductStore(PROJECT_ROOT / config["data_json"])
+        self.debounce_secs = debounce_secs
+        self.max_batch = max_batch
+        self._queue: queue.Queue[Path | None] = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="watch-ocr", daemon=True)
+        self._worker.start()
 
     def _handle_file(self, src_path: str) -> None:
-        """1 ファイルを処理（作成・変更どちらからでも共通）。"""
+        """1 ファイルをキューに積む（作成・変更どちらからでも共通）。"""
         path = Path(src_path)
         if not path.is_file() or not is_image_file(path):
             return
-        key = str(path.resolve())
-        if key in self._processed_paths:
-            return
-        self._processed_paths.add(key)
-        # 同期ドライブではファイルがまだ書き込み中のことがあるので待つ
-        time.sleep(2)
-        if not path.exists():
-            self._processed_paths.discard(key)
-            return
-        try:
-            process_new_image(path, self.config)
-        finally:
-            self._processed_paths.discard(key)
+        self._queue.put(path.resolve())
+
+    def _run(self) -> None:
+        """キューからファイルを集めてまとめて処理する（stop で None が来たら残りを処理して終わる）。"""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            # 同じファイルのイベントが何度来ても1回だけ（順番は最初に来た順）
+            batch = {first: None}
+            while len(batch) < self.max_batch:
+                try:
+                    path = self._queue.get(timeout=self.debounce_secs)
+                except queue.Empty:
+                    break
+                if path is None:
+                    stopping = True
+                    break
+                batch[path] = None
+            # 処理済みは processed/ へ移っているので、後から来た同じファイルのイベントはここで落ちる
+            paths = [p for p in batch if p.exists()]
+            if not paths:
+                continue
+            try:
+                process_new_images(paths, self.config, self.reader, self.store)
+            except Exception as e:
+                logger.exception("処理中にエラー: %s", e)
+
+    def stop(self) -> None:
+        """キューに残ったファイルを処理し終えるまで待ってからスレッドを止める。"""
+        self._queue.put(None)
+        self._worker.join()
 
     def on_created(self, event):
         if event.is_directory:
@@ -232,9 +417,34 @@ def main():
         logger.error("watchdog がインストールされていません。pip install watchdog を実行してください。")
         return 1
 
+    # EasyOCR はモデルの読み込みに数秒かかるので、監視を始める前に1回だけ作って全ファイルで使い回す
+    reader = None
+    if config["ocr_backend"] == "easyocr":
+        try:
+            from scripts import mercari_ocr
+        except ImportError:
+            import mercari_ocr
+        logger.info("EasyOCR のモデルを読み込んでいます...")
+        # model_dir を決めておくと、2回目以降の起動はダウンロードを確認せずそこから読む
+        model_dir = None
+        if config["model_dir"]:
+            model_dir = Path(config["model_dir"])
+            if not model_dir.is_absolute():
+                model_dir = PROJECT_ROOT / model_dir
+        try:
+            reader = mercari_ocr.create_easyocr_reader(model_dir)
+        except ImportError:
+            logger.error("easyocr がインストールされていません。pip install easyocr を実行してください。")
+            return 1
+
+    # data.json は起動時に1回だけ読み、追記は数秒ごとにまとめて書き出す
+    store = ProductStore(PROJECT_ROOT / config["data_json"])
+
+    image_handler = NewImageHandler(config, reader, store)
+
     class Handler(FileSystemEventHandler):
-        def __init__(self, config: dict):
-            self._handler = NewImageHandler(config)
+        def __init__(self, handler: NewImageHandler):
+            self._handler = handler
 
         def on_created(self, event):
             self._handler.on_created(event)
@@ -243,7 +453,7 @@ def main():
             self._handler.on_modified(event)
 
     observer = Observer()
-    handler = Handler(config)
+    handler = Handler(image_handler)
     observer.schedule(handler, str(watch_folder), recursive=False)
     observer.start()
     logger.info("監視を開始しました: %s (.png / .jpg の新規追加のみ処理)", watch_folder)
@@ -253,6 +463,8 @@ def main():
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
+    image_handler.stop()
+    store.flush()
     return 0
 
 
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""mercari_ocr のテスト（python -m unittest discover tests）"""
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
+
+class ExtractFromImagesAfterInProcessCall(unittest.TestCase):
+    """
+    1枚だけ extract_from_image（領域用スレッドプールが親で動く）→ extract_from_images(workers=2)（fork した子）
+    の順に呼んでも止まらないこと（監視スクリプトで1枚 → まとめて届いたとき）。
+    """
+
+    @unittest.skipUnless(hasattr(os, "fork"), "fork の無い環境では子プロセスがプールを引き継がない")
+    def test_pool_workers_do_not_hang(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            image_path = Path(tmp) / "shot.png"
+            code = textwrap.dedent(
+                f"""
+                import sys, time, warnings
+                warnings.simplefilter("ignore")
+                sys.path.insert(0, {str(SCRIPTS_DIR)!r})
+                import numpy as np
+                from PIL import Image
+                import mercari_ocr
+
+                path = {str(image_path)!r}
+                Image.fromarray(np.zeros((2556, 1179, 3), dtype=np.uint8)).save(path)
+                mercari_ocr.extract_from_image(path)
+                # 領域プールのスレッドを全部起こしてから待たせる（本物の tesseract で3領域を読んだ後と同じ状態）
+                list(mercari_ocr._get_region_pool().map(time.sleep, [0.2] * mercari_ocr._REGION_WORKERS))
+                results = mercari_ocr.extract_from_images([path] * 4, workers=2)
+                print(len(results))
+                """
+            )
+            try:
+                proc = subprocess.run(
+                    [sys.executable, "-c", code], capture_output=True, text=True, timeout=60
+                )
+            except subprocess.TimeoutExpired:
+                self.fail("extract_from_images が fork 後のプールで止まりました")
+            self.assertEqual(proc.returncode, 0, proc.stderr)
+            self.assertEqual(proc.stdout.strip(), "4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""ocr_preprocess のテスト（python -m unittest discover tests）"""
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import ocr_preprocess  # noqa: E402
+
+
+class PreprocessWithoutCv2(unittest.TestCase):
+    """cv2 が無いとき、返した画像がバッファプールと中身を共有しないこと"""
+
+    def test_result_survives_next_call_with_same_shape(self):
+        rng = np.random.default_rng(0)
+        # 低コントラスト（std が小さい）で adaptive threshold が有効、高さ 120 以下で sharpen は無効
+        first_in = rng.integers(100, 140, size=(100, 200), dtype=np.uint8)
+        second_in = rng.integers(100, 140, size=(100, 200), dtype=np.uint8)
+        with mock.patch.object(ocr_preprocess, "_get_cv2", return_value=None):
+            first = ocr_preprocess.preprocess_for_ocr(first_in)
+            expected = np.array(first)
+            ocr_preprocess.preprocess_for_ocr(second_in)
+        np.testing.assert_array_equal(np.array(first), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
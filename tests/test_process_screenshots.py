@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""process_screenshots のテスト（python -m unittest discover tests）"""
+import json
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import process_screenshots as ps  # noqa: E402
+
+
+def _brute_force_same_product_group(top_a, full_a, top_b, full_b, min_overlap=3):
+    """n-gram 化する前の same_product_group（部分文字列を1つずつ in で探す）"""
+    na = ps.normalize_text(top_a)
+    nb = ps.normalize_text(top_b)
+    fa = ps.normalize_text(full_a)
+    fb = ps.normalize_text(full_b)
+    if len(na) < min_overlap and len(nb) < min_overlap:
+        return False
+    if na and na in fb:
+        return True
+    if nb and nb in fa:
+        return True
+    for i in range(len(na) - min_overlap + 1):
+        if na[i : i + min_overlap] in fb:
+            return True
+    for i in range(len(nb) - min_overlap + 1):
+        if nb[i : i + min_overlap] in fa:
+            return True
+    return False
+
+
+def _random_text(rng: random.Random, max_len: int) -> str:
+    # 文字の種類を少なくして、一致・包含・短い上側テキストの組が十分に出るようにする
+    return "".join(rng.choice("ab あ") for _ in range(rng.randint(0, max_len)))
+
+
+def _random_shot(rng: random.Random) -> tuple[str, str]:
+    top = _random_text(rng, 6)
+    full = _random_text(rng, 4) + top + _random_text(rng, 8) if rng.random() < 0.7 else _random_text(rng, 12)
+    return top, full
+
+
+class SameProductGroupMatchesBruteForce(unittest.TestCase):
+    """n-gram 版の判定（_signatures_match / _candidate_pairs）が元の総当たりと同じ結果になること"""
+
+    def test_signatures_match(self):
+        rng = random.Random(12)
+        for _ in range(2000):
+            min_overlap = rng.choice((2, 3, 4))
+            (top_a, full_a), (top_b, full_b) = _random_shot(rng), _random_shot(rng)
+            expected = _brute_force_same_product_group(top_a, full_a, top_b, full_b, min_overlap)
+            sig_a = ps._group_signature(top_a, full_a, min_overlap)
+            sig_b = ps._group_signature(top_b, full_b, min_overlap)
+            self.assertEqual(
+                ps._signatures_match(sig_a, sig_b, min_overlap),
+                expected,
+                (top_a, full_a, top_b, full_b, min_overlap),
+            )
+
+    def test_candidate_pairs(self):
+        rng = random.Random(34)
+        for _ in range(200):
+            min_overlap = rng.choice((2, 3, 4))
+            shots = [_random_shot(rng) for _ in range(rng.randint(0, 12))]
+            expected = [
+                (i, j)
+                for i in range(len(shots))
+                for j in range(i + 1, len(shots))
+                if _brute_force_same_product_group(*shots[i], *shots[j], min_overlap)
+            ]
+            sigs = [ps._group_signature(top, full, min_overlap) for top, full in shots]
+            self.assertEqual(ps._candidate_pairs(sigs, min_overlap), expected, (shots, min_overlap))
+
+
+class OcrCacheTest(unittest.TestCase):
+    """OCR 結果のキャッシュ: 設定が変われば別のキーになり、壊れたキャッシュは読み飛ばすこと"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        for patcher in (
+            mock.patch.object(ps, "OCR_CACHE_DIR", self.tmp / ".ocr_cache"),
+            mock.patch.object(ps, "REUSE_SIMILAR_OCR", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.image = self.tmp / "shot.png"
+        self.image.write_bytes(b"not really a png")
+
+    def test_config_change_invalidates_mercari_entries(self):
+        config = self.tmp / "screenshot_config.json"
+        config.write_text(json.dumps({"preprocess": False}), encoding="utf-8")
+        with mock.patch.object(ps, "CONFIG_JSON", config):
+            before = ps._mercari_cache_settings()
+            config.write_text(json.dumps({"preprocess": True}), encoding="utf-8")
+            after = ps._mercari_cache_settings()
+        self.assertNotEqual(before, after)
+        digest = ps._file_digest(self.image)
+        ps._ocr_cache_store(ps._ocr_cache_key(digest, before), {"brand": "B"})
+        self.assertEqual(ps._ocr_cache_load(ps._ocr_cache_key(digest, before)), {"brand": "B"})
+        self.assertIsNone(ps._ocr_cache_load(ps._ocr_cache_key(digest, after)))
+
+    def test_zone_change_invalidates_easyocr_entries(self):
+        zones = {"brand": {"y_min": 0.6, "y_max": 0.68}}
+        with mock.patch.object(ps, "CROP_BEFORE_OCR", True), mock.patch.object(ps, "ZONE_CONFIG", zones):
+            before = ps._easyocr_cache_settings()
+        moved = {"brand": {"y_min": 0.62, "y_max": 0.7}}
+        with mock.patch.object(ps, "CROP_BEFORE_OCR", True), mock.patch.object(ps, "ZONE_CONFIG", moved):
+            after = ps._easyocr_cache_settings()
+        with mock.patch.object(ps, "CROP_BEFORE_OCR", False):
+            uncropped = ps._easyocr_cache_settings()
+        self.assertEqual(len({before, after, uncropped}), 3)
+
+    def test_corrupt_or_partial_entry_is_ignored(self):
+        key = ps._ocr_cache_key(ps._file_digest(self.image), "settings")
+        ps.OCR_CACHE_DIR.mkdir()
+        for broken in (b'{"brand": "B", "produ', b"\xff\xfe\x00garbage", b""):
+            (ps.OCR_CACHE_DIR / f"{key}.json").write_bytes(broken)
+            self.assertIsNone(ps._ocr_cache_load(key))
+            digests, cached, phashes = ps._lookup_ocr_cache([self.image], "settings")
+            self.assertEqual(cached, {self.image: None})
+            self.assertEqual(phashes, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""watch_drive.ProductStore と compact_jsonl のテスト（python -m unittest discover tests）"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import compact_jsonl  # noqa: E402
+import watch_drive  # noqa: E402
+
+
+def _item(num: int, **extra) -> dict:
+    return {"id": f"product-{num:03d}", "brand": "B", "product_name": f"P{num}", **extra}
+
+
+class ProductStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.data_json = Path(self._tmp.name) / "data" / "data.json"
+        self.journal = compact_jsonl.journal_path(self.data_json)
+
+    def _write_data(self, items: list) -> None:
+        self.data_json.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.data_json, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False)
+
+    def _read_data(self) -> list:
+        with open(self.data_json, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _store(self) -> watch_drive.ProductStore:
+        store = watch_drive.ProductStore(self.data_json, flush_delay=3600)
+        self.addCleanup(self._abandon, store)
+        return store
+
+    @staticmethod
+    def _abandon(store: watch_drive.ProductStore) -> None:
+        """flush せずに落ちたのと同じ状態にする（タイマーを止めて追記ログを閉じるだけ）"""
+        if store._timer is not None:
+            store._timer.cancel()
+        if store._journal is not None:
+            store._journal.close()
+            store._journal = None
+
+    def test_add_appends_to_journal_before_flush(self):
+        self._write_data([_item(1)])
+        store = self._store()
+        store.add(_item(2))
+        self.assertEqual([i["id"] for i in self._read_data()], ["product-001"])
+        self.assertEqual(compact_jsonl.read_jsonl(self.journal), [_item(2)])
+
+    def test_crash_without_flush_is_compacted_on_reload(self):
+        self._write_data([_item(1)])
+        store = self._store()
+        store.add({**_item(2), "id": store.reserve_id()})
+        self._abandon(store)
+
+        reloaded = self._store()
+        self.assertEqual([i["id"] for i in self._read_data()], ["product-001", "product-002"])
+        self.assertFalse(self.journal.exists())
+        self.assertEqual(reloaded.reserve_id(), "product-003")
+
+    def test_flush_writes_pending_and_clears_journal(self):
+        store = self._store()
+        store.add(_item(1))
+        store.add(_item(2))
+        store.flush()
+        self.assertEqual([i["id"] for i in self._read_data()], ["product-001", "product-002"])
+        self.assertFalse(self.journal.exists())
+        self.assertIsNone(store._timer)
+
+    def test_flush_keeps_external_edit(self):
+        self._write_data([_item(1)])
+        store = self._store()
+        store.add(_item(2))
+        # 書き出す前に data.json が外で編集された（mtime が確実に変わるよう1秒進める）
+        self._write_data([_item(1, brand="edited"), _item(5)])
+        st = self.data_json.stat()
+        os.utime(self.data_json, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        store.flush()
+        data = self._read_data()
+        self.assertEqual([i["id"] for i in data], ["product-001", "product-005", "product-002"])
+        self.assertEqual(data[0]["brand"], "edited")
+        self.assertEqual(store.reserve_id(), "product-006")
+
+    def test_corrupt_data_json_blocks_reserve_id(self):
+        self.data_json.parent.mkdir(parents=True, exist_ok=True)
+        self.data_json.write_text("[{", encoding="utf-8")
+        with self.assertLogs(watch_drive.logger, "ERROR"):
+            store = self._store()
+        with self.assertRaises(ValueError):
+            store.reserve_id()
+        self.assertEqual(self.data_json.read_text(encoding="utf-8"), "[{")
+
+
+class CompactTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.data_json = Path(self._tmp.name) / "data.json"
+        self.journal = compact_jsonl.journal_path(self.data_json)
+
+    def test_skips_ids_already_in_data_json_and_partial_lines(self):
+        self.data_json.write_text(json.dumps([_item(1), _item(2)]), encoding="utf-8")
+        with open(self.journal, "w", encoding="utf-8") as f:
+            for item in (_item(2), _item(3)):
+                f.write(json.dumps(item) + "\n")
+            f.write('{"id": "product-004", "bra')  # 書きかけで落ちた最後の行
+        self.assertEqual(compact_jsonl.compact(self.data_json), 1)
+        data = json.loads(self.data_json.read_text(encoding="utf-8"))
+        self.assertEqual([i["id"] for i in data], ["product-001", "product-002", "product-003"])
+        self.assertFalse(self.journal.exists())
+
+    def test_corrupt_data_json_leaves_both_files(self):
+        self.data_json.write_text("not json", encoding="utf-8")
+        self.journal.write_text(json.dumps(_item(1)) + "\n", encoding="utf-8")
+        with self.assertRaises(ValueError):
+            compact_jsonl.compact(self.data_json)
+        self.assertEqual(self.data_json.read_text(encoding="utf-8"), "not json")
+        self.assertTrue(self.journal.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()